@@ -0,0 +1,69 @@
+"""
+Compare the Pillow and NumPy compose backends.
+
+    python benchmarks/bench_backends.py [--runs 5] [--size 6000x4000]
+
+The resized source is cached before timing so the numbers isolate the compose
+step (crop/paste, frames, fit bounds) that the backends actually differ in.
+Every configuration is also checked for byte-identical output.
+"""
+import argparse
+import itertools
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+
+from innie_engine import ResizeCache, TileSettings, generate_tiles, np
+
+
+def synthetic_source(width, height):
+    # Smooth gradient, non-black everywhere so fit-mode bounds are the letterbox
+    gradient = Image.linear_gradient("L").resize((width, height))
+    return Image.merge("RGB", (gradient, gradient.transpose(Image.FLIP_LEFT_RIGHT), Image.new("L", (width, height), 128)))
+
+
+def time_backend(img, settings, backend, cache, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        generate_tiles(img, settings, cache=cache, backend=backend)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--size", default="6000x4000", help="synthetic source size WxH")
+    args = parser.parse_args()
+
+    if np is None:
+        print("Error: numpy not installed.")
+        return 1
+
+    width, height = map(int, args.size.lower().split("x"))
+    img = synthetic_source(width, height)
+    cache = ResizeCache()
+
+    print(f"Source {width}×{height}, median of {args.runs} runs (resize cached)\n")
+    print(f"{'grid':>4} {'mode':>5} {'style':>10} {'thick':>5}  {'pillow':>9} {'numpy':>9} {'speedup':>7}  identical")
+    for grid, mode, style, thickness in itertools.product((3, 9), ("cover", "fit"), ("outer", "individual"), (4, 40)):
+        settings = TileSettings(grid_count=grid, mode=mode, frame_style=style, frame_thickness=thickness, edge_margin=36)
+        pillow_tiles = generate_tiles(img, settings, cache=cache, backend="pillow")
+        numpy_tiles = generate_tiles(img, settings, cache=cache, backend="numpy")
+        identical = all(pillow_tiles[i].tobytes() == numpy_tiles[i].tobytes() for i in pillow_tiles)
+
+        t_pillow = time_backend(img, settings, "pillow", cache, args.runs)
+        t_numpy = time_backend(img, settings, "numpy", cache, args.runs)
+        print(f"{grid:>4} {mode:>5} {style:>10} {thickness:>5}  {t_pillow * 1000:>7.1f}ms {t_numpy * 1000:>7.1f}ms "
+              f"{t_pillow / t_numpy:>6.2f}×  {'✓' if identical else '✗'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,168 @@
+"""
+Peak memory of a full-resolution export: every tile at once vs one tile at a time.
+
+    python benchmarks/bench_memory.py                 # 12 MP source, 9-grid, both backends
+    python benchmarks/bench_memory.py --size 50 --grid 6
+
+Each export runs in a fresh process. The source is resized first, through the
+ResizeCache the export then reuses, so the resize transient (the same for
+both paths) is reported on its own. Two peaks are reported over the export
+itself, i.e. above what the process held once the source was resized:
+
+- tracemalloc: Python and NumPy allocations. With the NumPy backend, each
+  post buffer shows up here.
+- RSS: sampled every millisecond from /proc/self/statm. Pillow allocates
+  image memory outside tracemalloc's view, so this is what covers the
+  tiles and the preview canvas.
+
+"all at once" is generate_tiles + save_all_at_once, which holds every tile
+and a full-resolution preview (the export before export_tiles). "one at a
+time" is export_tiles. The run fails if export_tiles adds more than its
+encoder threads' tiles plus the one being composed, the downscaled preview
+and encoder slack.
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_pipeline import synthetic_source
+from PIL import Image
+
+from innie_engine import (PREVIEW_EXPORT_WIDTH, OutputProfile, ResizeCache, TileSettings, compute_layout,
+                          export_tiles, export_workers, generate_tiles, np, resize_source, tile_filename)
+
+PILLOW_PIXEL_BYTES = 4  # Pillow stores RGB as 4 bytes per pixel
+SLACK_BYTES = 24 * 2**20
+
+
+class RssSampler:
+    """Highest resident set size seen while running, sampled from /proc (Linux)."""
+
+    def __init__(self, interval=0.001):
+        self.interval = interval
+        self.peak = 0
+        self.running = False
+        self.page_size = os.sysconf("SC_PAGE_SIZE")
+
+    def current(self):
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * self.page_size
+
+    def sample(self):
+        while self.running:
+            self.peak = max(self.peak, self.current())
+            time.sleep(self.interval)
+
+    def __enter__(self):
+        self.running = True
+        self.start = self.peak = self.current()
+        self.thread = threading.Thread(target=self.sample, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.running = False
+        self.thread.join()
+
+
+def save_all_at_once(tiles, folder, settings, profile):
+    """Encode every tile plus a full-resolution preview concurrently, all held in memory at once."""
+    post_w, post_h = next(iter(tiles.values())).size
+    preview = Image.new("RGB", (settings.cols * post_w, settings.rows * post_h), (0, 0, 0))
+    for index, tile in tiles.items():
+        row, col = (index - 1) // settings.cols, (index - 1) % settings.cols
+        preview.paste(tile, (col * post_w, row * post_h))
+
+    kwargs = profile.save_kwargs()
+    with ThreadPoolExecutor(max_workers=min(len(tiles) + 1, os.cpu_count() or 1)) as pool:
+        futures = [pool.submit(preview.save, os.path.join(folder, f"preview_grid{profile.ext}"), **kwargs)]
+        for index, tile in tiles.items():
+            path = os.path.join(folder, tile_filename(index, len(tiles), profile.ext))
+            futures.append(pool.submit(tile.save, path, **kwargs))
+        for future in futures:
+            future.result()
+
+
+def run_export(case):
+    img = synthetic_source(case["size_mp"])
+    settings = TileSettings(grid_count=case["grid"])
+    profile = OutputProfile(format=case["format"])
+    layout = compute_layout(settings)
+    cache = ResizeCache()
+
+    # Resize first, through the cache the export then hits: the resize transient
+    # is the same for both paths, so it is measured on its own.
+    with RssSampler() as resize_rss:
+        resize_source(img, layout["W_visible"], layout["H_visible"], settings.mode, cache=cache,
+                      as_array=case["backend"] == "numpy")
+    after_resize = resize_rss.current()
+
+    with tempfile.TemporaryDirectory() as folder:
+        tracemalloc.start()
+        start = time.perf_counter()
+        with RssSampler() as export_rss:
+            if case["path"] == "all at once":
+                tiles = generate_tiles(img, settings, cache=cache, backend=case["backend"])
+                save_all_at_once(tiles, folder, settings, profile)
+                del tiles
+            else:
+                export_tiles(img, settings, folder, profile, backend=case["backend"], cache=cache)
+        seconds = time.perf_counter() - start
+        _, traced_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    return dict(case, seconds=seconds, tracemalloc_peak=traced_peak,
+                resize_delta=resize_rss.peak - resize_rss.start, rss_delta=export_rss.peak - after_resize)
+
+
+def expected_bound(settings, preview_width=PREVIEW_EXPORT_WIDTH):
+    """What export_tiles may add on top of the resized source: tiles in flight and the downscaled preview."""
+    layout = compute_layout(settings)
+    tile = layout["post_w"] * layout["post_h"] * PILLOW_PIXEL_BYTES
+    preview_h = round(preview_width * settings.rows * layout["post_h"] / (settings.cols * layout["post_w"]))
+    # One tile per encoder thread, plus the one being composed
+    tiles = export_workers(settings.grid_count) + 1
+    return tiles * tile + preview_width * preview_h * PILLOW_PIXEL_BYTES + SLACK_BYTES
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare export peak memory: all tiles at once vs one at a time.")
+    parser.add_argument("--size", type=float, default=12, help="source size in MP (default: 12)")
+    parser.add_argument("--grid", type=int, default=9)
+    parser.add_argument("--format", default="png", choices=sorted(OutputProfile.FORMATS))
+    args = parser.parse_args()
+
+    backends = ["pillow"] + (["numpy"] if np is not None else [])
+    cases = [{"size_mp": args.size, "grid": args.grid, "format": args.format, "backend": backend, "path": path}
+             for backend in backends for path in ("all at once", "one at a time")]
+    bound = expected_bound(TileSettings(grid_count=args.grid))
+
+    print(f"{args.size:g} MP source, {args.grid}-grid, {args.format}; "
+          f"bound for one at a time: resized source + {bound / 2**20:.0f} MB\n")
+    print(f"{'backend':<8} {'path':<14} {'seconds':>8} {'resize MB':>10} {'tracemalloc MB':>15} {'export RSS MB':>14}")
+    failed = False
+    with multiprocessing.Pool(processes=1, maxtasksperchild=1) as pool:
+        for result in pool.imap(run_export, cases):
+            print(f"{result['backend']:<8} {result['path']:<14} {result['seconds']:>8.2f} "
+                  f"{result['resize_delta'] / 2**20:>10.1f} {result['tracemalloc_peak'] / 2**20:>15.1f} "
+                  f"{result['rss_delta'] / 2**20:>14.1f}")
+            if result["path"] == "one at a time" and result["rss_delta"] > bound:
+                failed = True
+
+    if failed:
+        print(f"\n✗ export_tiles added more than {bound / 2**20:.0f} MB over the resized source")
+        return 1
+    print(f"\n✓ export_tiles added at most {bound / 2**20:.0f} MB over the resized source")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,204 @@
+"""
+Benchmark the tiling pipeline on synthetic sources.
+
+    python benchmarks/bench_pipeline.py                      # full matrix, compare to baseline
+    python benchmarks/bench_pipeline.py --quick              # 1/12 MP, 3/9 grids
+    python benchmarks/bench_pipeline.py --save-baseline      # record a new baseline
+    python benchmarks/bench_pipeline.py --out results.json   # keep the raw results
+
+Every case runs in a fresh worker process so its peak RSS is its own. Stages
+are timed separately: resize, then export (``export_tiles``, the production
+path: compose and encode interleaved, one tile at a time). tracemalloc
+records the peak of Python-tracked allocations (NumPy arrays included;
+Pillow's own buffers are only visible in RSS). Results are compared to the
+benchmarks/baseline.json entries recorded with the same backend and output
+format, and the run exits non-zero when a stage or memory peak regresses
+past the thresholds.
+"""
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import PIL
+from PIL import Image
+
+from innie_engine import (OutputProfile, ResizeCache, TileSettings, compute_layout, export_tiles, np, peak_rss_bytes,
+                          resize_source, resolve_backend)
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+FULL_MATRIX = {
+    "sizes_mp": (1, 12, 50, 100),
+    "grids": (3, 6, 9),
+    "modes": ("cover", "fit"),
+    "frame_styles": ("outer", "individual"),
+    "edge_margins": (0, 36),
+}
+QUICK_MATRIX = dict(FULL_MATRIX, sizes_mp=(1, 12), grids=(3, 9))
+
+# A stage must be this much slower (and by at least MIN_DELTA seconds) to count
+TIME_THRESHOLD = 1.25
+MEMORY_THRESHOLD = 1.20
+MIN_DELTA = 0.02
+
+
+def synthetic_source(megapixels):
+    """Deterministic 4:3 RGB source: gradients plus noise so encoders do real work."""
+    width = int((megapixels * 1_000_000 * 4 / 3) ** 0.5)
+    height = int(width * 3 / 4)
+    gradient = Image.linear_gradient("L").resize((width, height))
+    noise = Image.effect_noise((width, height), 24)
+    return Image.merge("RGB", (gradient, noise, gradient.transpose(Image.FLIP_LEFT_RIGHT)))
+
+
+def case_id(case):
+    """Baseline key: the settings plus the resolved backend and output format, which both change every stage."""
+    return "{size_mp}mp-g{grid}-{mode}-{frame_style}-e{edge_margin}-{backend}-{format}".format(**case)
+
+
+def run_case(case):
+    """One benchmark case; meant to run in its own process."""
+    img = synthetic_source(case["size_mp"])
+    rss_source = peak_rss_bytes()
+    settings = TileSettings(grid_count=case["grid"], mode=case["mode"], frame_style=case["frame_style"],
+                            edge_margin=case["edge_margin"])
+    backend = resolve_backend(case.get("backend"))
+    profile = OutputProfile(format=case.get("format", "png"))
+    layout = compute_layout(settings)
+    cache = ResizeCache()
+
+    tracemalloc.start()
+    stages = {}
+    start = time.perf_counter()
+    resize_source(img, layout["W_visible"], layout["H_visible"], settings.mode, cache=cache,
+                  as_array=backend == "numpy")
+    stages["resize"] = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as folder:
+        t = time.perf_counter()
+        export_tiles(img, settings, folder, profile, backend=backend, cache=cache)
+        stages["export"] = time.perf_counter() - t
+    stages["total"] = time.perf_counter() - start
+    _, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    case = dict(case, backend=backend, format=profile.format)
+    return dict(case, id=case_id(case), stages=stages, tracemalloc_peak=traced_peak,
+                rss_peak=peak_rss_bytes(), rss_after_source=rss_source)
+
+
+def build_cases(matrix, backend=None, fmt="png"):
+    cases = []
+    for size, grid, mode, style, edge in itertools.product(
+            matrix["sizes_mp"], matrix["grids"], matrix["modes"], matrix["frame_styles"], matrix["edge_margins"]):
+        cases.append({"size_mp": size, "grid": grid, "mode": mode, "frame_style": style,
+                      "edge_margin": edge, "backend": backend, "format": fmt})
+    return cases
+
+
+def compare(results, baseline, time_threshold=TIME_THRESHOLD, memory_threshold=MEMORY_THRESHOLD):
+    """List of human-readable regressions of ``results`` against ``baseline``.
+
+    Only entries with the same id (settings, backend and format) are compared.
+    """
+    base = {r["id"]: r for r in baseline.get("results", [])}
+    regressions = []
+    for result in results:
+        ref = base.get(result["id"])
+        if not ref:
+            continue
+        for stage, seconds in result["stages"].items():
+            old = ref["stages"].get(stage)
+            if old and seconds > old * time_threshold and seconds - old > MIN_DELTA:
+                regressions.append(f"{result['id']} {stage}: {old:.3f}s → {seconds:.3f}s ({seconds / old:.2f}×)")
+        for key in ("rss_peak", "tracemalloc_peak"):
+            old, new = ref.get(key), result.get(key)
+            if old and new and new > old * memory_threshold:
+                regressions.append(f"{result['id']} {key}: {old / 2**20:.0f} MB → {new / 2**20:.0f} MB ({new / old:.2f}×)")
+    return regressions
+
+
+def environment():
+    return {
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pillow": PIL.__version__,
+        "numpy": np.__version__ if np is not None else None,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Innie tiling pipeline.")
+    parser.add_argument("--quick", action="store_true", help="small matrix (1/12 MP, 3/9 grids)")
+    parser.add_argument("--sizes", help="comma-separated source sizes in MP, overrides the matrix")
+    parser.add_argument("--backend", choices=("pillow", "numpy"), default=None)
+    parser.add_argument("--format", default="png", choices=sorted(OutputProfile.FORMATS))
+    parser.add_argument("--out", help="write results JSON here")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="baseline JSON to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="write results as the new baseline")
+    parser.add_argument("--time-threshold", type=float, default=TIME_THRESHOLD)
+    parser.add_argument("--memory-threshold", type=float, default=MEMORY_THRESHOLD)
+    args = parser.parse_args()
+
+    matrix = dict(QUICK_MATRIX if args.quick else FULL_MATRIX)
+    if args.sizes:
+        matrix["sizes_mp"] = tuple(float(s) if "." in s else int(s) for s in args.sizes.split(","))
+    cases = build_cases(matrix, args.backend, args.format)
+
+    print(f"Running {len(cases)} cases...\n")
+    print(f"{'case':<42} {'resize':>8} {'export':>8} {'total':>8} {'rss MB':>7}")
+    results = []
+    # maxtasksperchild=1: fresh process per case, so ru_maxrss is per case
+    with multiprocessing.Pool(processes=1, maxtasksperchild=1) as pool:
+        for result in pool.imap(run_case, cases):
+            results.append(result)
+            s = result["stages"]
+            print(f"{result['id']:<42} {s['resize']:>8.3f} {s['export']:>8.3f} {s['total']:>8.3f} "
+                  f"{(result['rss_peak'] or 0) / 2**20:>7.0f}")
+
+    report = {"environment": environment(), "matrix": matrix, "results": results}
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.out}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n✓ Baseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("\nNo baseline to compare against (run with --save-baseline).")
+        return 0
+
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    recorded = {r["id"] for r in baseline.get("results", [])}
+    if not any(result["id"] in recorded for result in results):
+        print(f"\nNo {os.path.basename(args.baseline)} entries for this backend and format (run with --save-baseline).")
+        return 0
+    regressions = compare(results, baseline, args.time_threshold, args.memory_threshold)
+    if regressions:
+        print(f"\n✗ {len(regressions)} regressions against {os.path.basename(args.baseline)}:")
+        for line in regressions:
+            print(f"  {line}")
+        return 1
+    print(f"\n✓ No regressions against {os.path.basename(args.baseline)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
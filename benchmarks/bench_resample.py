@@ -0,0 +1,93 @@
+"""
+Speed vs quality of the resampling filters for each thing Innie downscales.
+
+    python benchmarks/bench_resample.py [--runs 3] [--size 12 --size 50]
+
+For every purpose (export: the full-resolution visible area of a 9-grid;
+preview: the same area at the app's 140 px cell width, PREVIEW_CELL_WIDTH;
+thumbnail: the 248×120 sidebar thumbnail) each filter runs with and without
+box pre-reduction (``reducing_gap``). Quality is PSNR against a single-step
+LANCZOS resize, the export reference; "exact" means byte-identical to it.
+The synthetic source carries per-pixel noise, so aliasing is a worst case
+here and real photos score higher. Presets from RESAMPLE_PRESETS are
+marked with their name.
+"""
+import argparse
+import math
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import ImageChops, ImageStat
+
+from bench_pipeline import synthetic_source
+from innie_engine import (POST_W, PREVIEW_CELL_WIDTH, RESAMPLE_PRESETS, Resample, TileSettings, compute_layout,
+                          resize_source)
+
+FILTERS = ("bilinear", "bicubic", "lanczos")
+REDUCING_GAPS = (None, 3.0, 2.0)
+THUMBNAIL_BOX = (248, 120)
+
+
+def targets(img):
+    """(purpose, resize function) for each downscale the app does."""
+    settings = TileSettings(grid_count=9)
+    full = compute_layout(settings)
+    small = compute_layout(settings, PREVIEW_CELL_WIDTH / POST_W)
+    return [
+        ("export", lambda r: resize_source(img, full["W_visible"], full["H_visible"], settings.mode, r)),
+        ("preview", lambda r: resize_source(img, small["W_visible"], small["H_visible"], settings.mode, r)),
+        ("thumbnail", lambda r: r.contain(img, THUMBNAIL_BOX)),
+    ]
+
+
+def psnr(a, b):
+    diff = ImageChops.difference(a, b)
+    if diff.getbbox() is None:
+        return math.inf
+    mse = sum(rms ** 2 for rms in ImageStat.Stat(diff).rms) / len(diff.getbands())
+    return 10 * math.log10(255 ** 2 / mse)
+
+
+def timed(fn, resample, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = fn(resample)
+        timings.append(time.perf_counter() - start)
+    return result, statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--size", type=float, action="append", help="source size in MP, repeatable (default: 12, 50)")
+    args = parser.parse_args()
+
+    for size_mp in args.size or [12, 50]:
+        img = synthetic_source(size_mp)
+        print(f"\n{size_mp:g} MP source ({img.size[0]}×{img.size[1]})")
+        print(f"{'purpose':<10} {'filter':<9} {'gap':>4} {'ms':>9} {'speedup':>8} {'PSNR dB':>8}")
+        for purpose, fn in targets(img):
+            reference = fn(Resample("lanczos"))  # also warms up the source's pixel access
+            rows = []
+            for filter_name in FILTERS:
+                for gap in REDUCING_GAPS:
+                    resample = Resample(filter_name, gap)
+                    result, seconds = timed(fn, resample, args.runs)
+                    rows.append((resample, seconds, psnr(result, reference)))
+            reference_s = next(seconds for resample, seconds, _ in rows if resample == Resample("lanczos"))
+            for resample, seconds, quality in rows:
+                quality = "exact" if quality == math.inf else f"{quality:.1f}"
+                gap_text = f"{resample.reducing_gap:g}" if resample.reducing_gap else "-"
+                preset = "◀ used" if resample == RESAMPLE_PRESETS[purpose] else ""
+                print(f"{purpose:<10} {resample.filter:<9} {gap_text:>4} {seconds * 1000:>9.1f} "
+                      f"{reference_s / seconds:>7.1f}x {quality:>8}  {preset}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
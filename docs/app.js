@@ -1,9 +1,33 @@
 const POST_W = 1080;
 const POST_H = 1350;
+// preview_grid is written this wide, as by the Python engine (PREVIEW_EXPORT_WIDTH)
+const PREVIEW_EXPORT_WIDTH = 1080;
 
-let sourceImage = null;
+// Sources are decoded no larger than the biggest grid can use (3240×4050 for
+// 3 × 3), once per file. Renders only ever draw from this capped copy.
+const MAX_GRID_COUNT = 9;
+const MAX_SOURCE_W = 3 * POST_W;
+const MAX_SOURCE_H = (MAX_GRID_COUNT / 3) * POST_H;
+
+let sourceImage = null;  // capped source; handed to the render worker when there is one
+let sourceSize = null;   // its [width, height]
 let sourceName = '';
+let sourceFile = null;   // kept so a replacement render worker can decode the source again
+let thumbUrl = null;
+let sourceLoad = 0;
 let tiles = [];
+let renderGeneration = 0;
+
+// Tiles render in a Web Worker where the browser has OffscreenCanvas, else on
+// the main thread. ?render=main forces the main thread, to compare blocking time.
+// A crashed worker is replaced; after MAX_WORKER_CRASHES rendering moves to the main thread.
+const MAX_WORKER_CRASHES = 3;
+let renderWorker = createRenderWorker();
+let workerCrashes = 0;
+let workerSource = Promise.resolve();
+let sourceReload = Promise.resolve();
+let workerRenderId = 0;
+const workerRenders = new Map();
 
 // DOM Elements
 const imageInput = document.getElementById('imageInput');
@@ -56,34 +80,104 @@ dropZone.addEventListener('drop', (e) => {
 // Initialize
 updateGridDisplay();
 
-function handleImageSelect(e) {
+// Offline-first: sw.js precaches the app so repeat visits start from cache
+if ('serviceWorker' in navigator && location.protocol !== 'file:') {
+    window.addEventListener('load', () => {
+        navigator.serviceWorker.register('sw.js').catch(e => console.warn('Service worker not registered:', e));
+    });
+}
+
+async function handleImageSelect(e) {
     const file = e.target.files[0];
     if (!file) return;
 
     sourceName = file.name.replace(/\.[^/.]+$/, '');
     fileName.textContent = file.name;
 
-    const reader = new FileReader();
-    reader.onload = (event) => {
-        const img = new Image();
-        img.onload = () => {
-            sourceImage = img;
-            thumbImg.src = event.target.result;
-            dropZone.style.display = 'none';
-            imageThumb.classList.add('active');
-            showToast(`Loaded: ${img.width}×${img.height}`, true);
-        };
-        img.src = event.target.result;
-    };
-    reader.readAsDataURL(file);
+    // The thumbnail shows the file through an object URL; it also tells us the native size
+    if (thumbUrl) URL.revokeObjectURL(thumbUrl);
+    thumbUrl = URL.createObjectURL(file);
+    const load = ++sourceLoad;
+    try {
+        await new Promise((resolve, reject) => {
+            thumbImg.onload = resolve;
+            thumbImg.onerror = () => reject(new Error('Could not read image'));
+            thumbImg.src = thumbUrl;
+        });
+        const nativeW = thumbImg.naturalWidth, nativeH = thumbImg.naturalHeight;
+        const source = await decodeSource(file, nativeW, nativeH);
+        if (load !== sourceLoad) {
+            // Another file was picked while this one decoded
+            if (source.close) source.close();
+            return;
+        }
+        setSource(source);
+        sourceFile = file;
+
+        dropZone.style.display = 'none';
+        imageThumb.classList.add('active');
+        let info = `Loaded: ${nativeW}×${nativeH}`;
+        if (source.width !== nativeW || source.height !== nativeH) info += ` → ${source.width}×${source.height}`;
+        showToast(info, true);
+    } catch (err) {
+        showToast(err.message);
+    }
+}
+
+// Decode size for a w×h photo: just enough to cover the largest grid, never upscaled
+function cappedSize(w, h) {
+    const scale = Math.min(1, Math.max(MAX_SOURCE_W / w, MAX_SOURCE_H / h));
+    return [Math.ceil(w * scale), Math.ceil(h * scale)];
+}
+
+// Decodes straight to the capped size, so the full-resolution pixels never
+// sit in canvas memory. Falls back to drawing the loaded <img> into a canvas
+// where createImageBitmap can't resize (or can't take a Blob).
+async function decodeSource(file, w, h) {
+    const [targetW, targetH] = cappedSize(w, h);
+    if (typeof createImageBitmap !== 'undefined') {
+        try {
+            const bitmap = await createImageBitmap(file, {
+                resizeWidth: targetW, resizeHeight: targetH, resizeQuality: 'high',
+            });
+            if (bitmap.width === targetW && bitmap.height === targetH) return bitmap;
+            bitmap.close();  // resize options ignored
+        } catch (err) {
+            // fall through to the canvas path
+        }
+    }
+
+    const canvas = document.createElement('canvas');
+    canvas.width = targetW;
+    canvas.height = targetH;
+    const ctx = canvas.getContext('2d');
+    ctx.imageSmoothingQuality = 'high';
+    ctx.drawImage(thumbImg, 0, 0, targetW, targetH);
+    return canvas;
+}
+
+function setSource(source) {
+    if (sourceImage && sourceImage.close) sourceImage.close();
+    sourceSize = source ? [source.width, source.height] : null;
+    if (renderWorker) {
+        // The worker keeps the only copy; renders just send settings from here on
+        sendSourceToWorker(source);
+        sourceImage = null;
+    } else {
+        sourceImage = source;
+    }
 }
 
 function clearImage() {
-    sourceImage = null;
+    sourceLoad++;
+    setSource(null);
+    sourceFile = null;
     sourceName = '';
     imageInput.value = '';
     fileName.textContent = '';
     thumbImg.src = '';
+    if (thumbUrl) URL.revokeObjectURL(thumbUrl);
+    thumbUrl = null;
     dropZone.style.display = 'block';
     imageThumb.classList.remove('active');
     tiles = [];
@@ -103,216 +197,192 @@ function updateGridDisplay() {
         previewGrid.appendChild(cell);
     }
     tiles = [];
+    renderGeneration++;  // drop any render still in flight for the old grid
 }
 
-function renderPreview() {
-    if (!sourceImage) {
-        showToast('Please select an image first');
-        return;
-    }
-
-    const count = parseInt(gridCount.value);
-    const rows = count / 3;
-    const cols = 3;
-    const Mt = parseInt(marginTB.value);
-    const Ms = parseInt(marginSide.value);
-    const modeVal = mode.value;
-    const frameOn = frameEnabled.checked;
-    const frameStyleVal = frameStyle.value;
-    const frameThick = parseInt(frameThickness.value);
-    const edgeEnabled = edgeTilesEnabled.checked;
-    const edgeMargin = edgeEnabled ? (parseInt(edgeTilesMargin.value) || 0) : 0;
-
-    if (Ms * 2 >= POST_W || (rows === 1 && Mt * 2 >= POST_H)) {
-        showToast('Margins too large');
-        return;
-    }
+function readSettings() {
+    return {
+        grid_count: parseInt(gridCount.value),
+        margin_tb: parseInt(marginTB.value),
+        margin_side: parseInt(marginSide.value),
+        frame_enabled: frameEnabled.checked,
+        frame_thickness: parseInt(frameThickness.value),
+        frame_style: frameStyle.value,
+        mode: mode.value,
+        edge_margin: edgeTilesEnabled.checked ? (parseInt(edgeTilesMargin.value) || 0) : 0,
+    };
+}
 
-    // Calculate content dimensions
-    // Edge margin: col 0 (tiles 1,4,7) gets RIGHT margin, col 2 (tiles 3,6,9) gets LEFT margin
-    const contentWidths = [];
-    for (let c = 0; c < cols; c++) {
-        const leftM = c === 0 ? Ms : 0;
-        const rightM = c === cols - 1 ? Ms : 0;
-        contentWidths.push(POST_W - leftM - rightM);
+function createRenderWorker() {
+    if (typeof Worker === 'undefined' || typeof OffscreenCanvas === 'undefined') return null;
+    if (new URLSearchParams(location.search).get('render') === 'main') return null;
+    let worker;
+    try {
+        worker = new Worker('render-worker.js');
+    } catch (e) {
+        // e.g. opened from file://, where workers can't load
+        return null;
     }
-
-    // Edge tiles padding (applied inside content area)
-    // Middle column (col 1, tiles 2,5,8) gets both left and right padding
-    const edgePadding = [];
-    for (let c = 0; c < cols; c++) {
-        let padLeft = (c === cols - 1) ? edgeMargin : 0;   // Col 2 (tiles 3,6,9): LEFT padding
-        let padRight = (c === 0) ? edgeMargin : 0;         // Col 0 (tiles 1,4,7): RIGHT padding
-        
-        // Middle column gets both sides
-        if (c === 1) {
-            padLeft = edgeMargin;
-            padRight = edgeMargin;
+    worker.onmessage = (e) => {
+        const pending = workerRenders.get(e.data.id);
+        if (!pending) return;
+        workerRenders.delete(e.data.id);
+        if (e.data.type === 'error') {
+            pending.reject(new Error(e.data.message));
+        } else {
+            pending.resolve(e.data);
         }
-        edgePadding.push({ padLeft, padRight });
-    }
+    };
+    worker.onerror = handleWorkerCrash;
+    return worker;
+}
 
-    // Actual image content = content area minus edge padding
-    const actualContentWidths = contentWidths.map((w, c) => w - edgePadding[c].padLeft - edgePadding[c].padRight);
+// The crashed worker took the only copy of the source with it: fail what was
+// in flight, start over with a new worker (or the main thread) and decode the
+// file again.
+function handleWorkerCrash(e) {
+    const error = new Error(e.message || 'Render worker failed');
+    for (const pending of workerRenders.values()) pending.reject(error);
+    workerRenders.clear();
+    renderWorker.terminate();
+    renderWorker = ++workerCrashes < MAX_WORKER_CRASHES ? createRenderWorker() : null;
+    if (!renderWorker) console.warn('Render worker keeps failing; rendering on the main thread');
+    workerSource = Promise.resolve();
+    if (sourceFile) sourceReload = reloadSource();
+}
 
-    const contentHeights = [];
-    for (let r = 0; r < rows; r++) {
-        const topM = rows === 1 ? Mt : (r === 0 ? Mt : 0);
-        const bottomM = rows === 1 ? Mt : (r === rows - 1 ? Mt : 0);
-        contentHeights.push(POST_H - topM - bottomM);
+async function reloadSource() {
+    const load = sourceLoad;
+    try {
+        const source = await decodeSource(sourceFile, thumbImg.naturalWidth, thumbImg.naturalHeight);
+        if (load !== sourceLoad) {
+            if (source.close) source.close();
+            return;
+        }
+        setSource(source);
+    } catch (err) {
+        showToast(err.message);
     }
+}
 
-    const W_visible = actualContentWidths.reduce((a, b) => a + b, 0);
-    const H_visible = contentHeights.reduce((a, b) => a + b, 0);
-
-    // Resize source image
-    const resizedCanvas = document.createElement('canvas');
-    resizedCanvas.width = W_visible;
-    resizedCanvas.height = H_visible;
-    const resizedCtx = resizedCanvas.getContext('2d');
-
-    if (modeVal === 'cover') {
-        resizeCover(resizedCtx, sourceImage, W_visible, H_visible);
-    } else {
-        resizeFit(resizedCtx, sourceImage, W_visible, H_visible);
+function sendSourceToWorker(source) {
+    if (!source || source instanceof ImageBitmap) {
+        // Transferred, not copied
+        workerSource = Promise.resolve();
+        renderWorker.postMessage({ type: 'source', bitmap: source }, source ? [source] : []);
+        return;
     }
+    workerSource = createImageBitmap(source).then(bitmap => {
+        renderWorker.postMessage({ type: 'source', bitmap }, [bitmap]);
+    });
+}
 
-    // Cumulative positions (based on actual content widths for slicing)
-    const cumW = [0];
-    for (let i = 0; i < actualContentWidths.length - 1; i++) cumW.push(cumW[i] + actualContentWidths[i]);
-    const cumH = [0];
-    for (let i = 0; i < contentHeights.length - 1; i++) cumH.push(cumH[i] + contentHeights[i]);
+async function renderInWorker(settings) {
+    // A new source may be sent while we wait for the previous one
+    let sent;
+    do {
+        sent = workerSource;
+        await sent;
+    } while (sent !== workerSource);
+    const id = ++workerRenderId;
+    const { tiles: rendered } = await new Promise((resolve, reject) => {
+        workerRenders.set(id, { resolve, reject });
+        renderWorker.postMessage({ type: 'render', id, settings });
+    });
+    // bitmaprenderer takes ownership of each bitmap without copying it
+    return rendered.map(({ index, bitmap }) => {
+        const canvas = document.createElement('canvas');
+        canvas.width = bitmap.width;
+        canvas.height = bitmap.height;
+        canvas.getContext('bitmaprenderer').transferFromImageBitmap(bitmap);
+        return { index, canvas };
+    });
+}
 
-    // Generate tiles
-    tiles = [];
-    let index = 1;
-
-    for (let r = 0; r < rows; r++) {
-        for (let c = 0; c < cols; c++) {
-            const x0 = cumW[c], y0 = cumH[r];
-            const srcW = actualContentWidths[c], srcH = contentHeights[r];
-            const topM = rows === 1 ? Mt : (r === 0 ? Mt : 0);
-            const leftM = c === 0 ? Ms : 0;
-            
-            // Edge padding for this column
-            const ePadLeft = edgePadding[c].padLeft;
-            const ePadRight = edgePadding[c].padRight;
-
-            const tileCanvas = document.createElement('canvas');
-            tileCanvas.width = POST_W;
-            tileCanvas.height = POST_H;
-            const ctx = tileCanvas.getContext('2d');
-
-            ctx.fillStyle = '#000';
-            ctx.fillRect(0, 0, POST_W, POST_H);
-            
-            // Draw image shifted by edge padding (leaves black margin on edge)
-            const drawX = leftM + ePadLeft;
-            ctx.drawImage(resizedCanvas, x0, y0, srcW, srcH, drawX, topM, srcW, srcH);
-            
-            // Content area for frame (full content width including edge padding)
-            const cw = contentWidths[c], ch = contentHeights[r];
-
-            // Draw frame
-            // Skip frame on sides where edge margin is applied
-            const skipLeft = ePadLeft > 0;
-            const skipRight = ePadRight > 0;
-            
-            if (frameOn) {
-                ctx.strokeStyle = '#fff';
-                ctx.lineWidth = 1;
-                const fl = leftM, ft = topM, fr = leftM + cw - 1, fb = topM + ch - 1;
-
-                if (frameStyleVal === 'outer') {
-                    // Outer frame: only on grid outer edges
-                    for (let t = 0; t < frameThick; t++) {
-                        if (r === 0) drawLine(ctx, fl, ft + t, fr, ft + t);
-                        if (r === rows - 1) drawLine(ctx, fl, fb - t, fr, fb - t);
-                        if (c === 0 && !skipLeft) drawLine(ctx, fl + t, ft, fl + t, fb);
-                        if (c === cols - 1 && !skipRight) drawLine(ctx, fr - t, ft, fr - t, fb);
-                    }
-                } else {
-                    // Individual frame: on grid outer edges, but using image content bounds for fit mode
-                    if (modeVal === 'fit') {
-                        // Fit mode: frame around actual image bounds, only on outer edges
-                        const bounds = getImageBounds(ctx, drawX, topM, srcW, srcH);
-                        if (bounds) {
-                            const { ix0, iy0, ix1, iy1 } = bounds;
-                            for (let t = 0; t < frameThick; t++) {
-                                if (r === 0) drawLine(ctx, ix0, iy0 + t, ix1, iy0 + t);  // top
-                                if (r === rows - 1) drawLine(ctx, ix0, iy1 - t, ix1, iy1 - t);  // bottom
-                                if (c === 0 && !skipLeft) drawLine(ctx, ix0 + t, iy0, ix0 + t, iy1);   // left
-                                if (c === cols - 1 && !skipRight) drawLine(ctx, ix1 - t, iy0, ix1 - t, iy1); // right
-                            }
-                        }
-                    } else {
-                        // Cover mode: frame around content area, only on outer edges
-                        for (let t = 0; t < frameThick; t++) {
-                            if (r === 0) drawLine(ctx, fl, ft + t, fr, ft + t);  // top
-                            if (r === rows - 1) drawLine(ctx, fl, fb - t, fr, fb - t);  // bottom
-                            if (c === 0 && !skipLeft) drawLine(ctx, fl + t, ft, fl + t, fb);   // left
-                            if (c === cols - 1 && !skipRight) drawLine(ctx, fr - t, ft, fr - t, fb); // right
-                        }
-                    }
-                }
-            }
+function renderOnMainThread(settings) {
+    const plan = compileLayoutPlan(settings);
+    const { post_w: postW, post_h: postH } = plan.layout;
+    const createCanvas = (w, h) => {
+        const canvas = document.createElement('canvas');
+        canvas.width = w;
+        canvas.height = h;
+        return canvas;
+    };
 
-            tiles.push(tileCanvas);
+    const resized = resizeSource(sourceImage, plan, createCanvas);
+    return planTilesFor(plan, sourceImage.width, sourceImage.height).map(spec => {
+        const canvas = createCanvas(postW, postH);
+        drawTile(canvas.getContext('2d'), resized, spec, postW, postH);
+        return { index: spec.index, canvas };
+    });
+}
 
-            const cell = document.getElementById(`cell-${index}`);
-            cell.innerHTML = '';
-            const img = document.createElement('img');
-            img.src = tileCanvas.toDataURL('image/png');
-            cell.appendChild(img);
-            index++;
-        }
+// Runs `work` and sums the main thread's long tasks (>50 ms) meanwhile, up to
+// the frame that shows the result. Long-task timing is Chromium-only; elsewhere
+// `blocked` is null.
+async function measureBlocking(work) {
+    const longTasks = [];
+    let observer = null;
+    if (PerformanceObserver.supportedEntryTypes?.includes('longtask')) {
+        observer = new PerformanceObserver(list => longTasks.push(...list.getEntries()));
+        observer.observe({ type: 'longtask' });
     }
 
-    showToast('Rendered successfully!', true);
-}
+    const start = performance.now();
+    const result = await work();
+    await new Promise(resolve => requestAnimationFrame(() => setTimeout(resolve, 0)));
+    const ms = performance.now() - start;
 
-function drawLine(ctx, x1, y1, x2, y2) {
-    ctx.beginPath();
-    ctx.moveTo(x1 + 0.5, y1 + 0.5);
-    ctx.lineTo(x2 + 0.5, y2 + 0.5);
-    ctx.stroke();
+    let blocked = null;
+    if (observer) {
+        longTasks.push(...observer.takeRecords());
+        observer.disconnect();
+        blocked = longTasks.reduce((sum, task) => sum + task.duration, 0);
+    }
+    return { result, ms, blocked, longTasks: longTasks.length };
 }
 
-function getImageBounds(ctx, startX, startY, width, height) {
-    const imageData = ctx.getImageData(startX, startY, width, height);
-    const data = imageData.data;
-    let minX = width, minY = height, maxX = -1, maxY = -1;
-
-    for (let y = 0; y < height; y++) {
-        for (let x = 0; x < width; x++) {
-            const idx = (y * width + x) * 4;
-            if (data[idx] > 5 || data[idx + 1] > 5 || data[idx + 2] > 5) {
-                if (x < minX) minX = x;
-                if (x > maxX) maxX = x;
-                if (y < minY) minY = y;
-                if (y > maxY) maxY = y;
-            }
-        }
+async function renderPreview() {
+    if (!sourceSize) {
+        showToast('Please select an image first');
+        return;
     }
 
-    if (maxX < 0) return null;
-    return { ix0: startX + minX, iy0: startY + minY, ix1: startX + maxX, iy1: startY + maxY };
-}
+    // All geometry comes from the layout plan (docs/layout.js, shared with the Python engine)
+    const settings = readSettings();
+    try {
+        compileLayoutPlan(settings);
+    } catch (e) {
+        showToast(e.message);
+        return;
+    }
 
-function resizeCover(ctx, img, targetW, targetH) {
-    const scale = Math.max(targetW / img.width, targetH / img.height);
-    const newW = Math.ceil(img.width * scale);
-    const newH = Math.ceil(img.height * scale);
-    ctx.drawImage(img, -(newW - targetW) / 2, -(newH - targetH) / 2, newW, newH);
-}
+    const generation = ++renderGeneration;
+    let measured;
+    try {
+        measured = await measureBlocking(async () => {
+            await sourceReload;
+            const rendered = renderWorker ? await renderInWorker(settings) : renderOnMainThread(settings);
+            if (generation !== renderGeneration) return null;
+
+            tiles = rendered.map(tile => tile.canvas);
+            for (const { index, canvas } of rendered) {
+                const cell = document.getElementById(`cell-${index}`);
+                cell.innerHTML = '';
+                cell.appendChild(canvas);
+            }
+            return rendered;
+        });
+    } catch (e) {
+        showToast(`Render failed: ${e.message}`);
+        return;
+    }
+    if (measured.result === null) return;  // superseded by a newer render
 
-function resizeFit(ctx, img, targetW, targetH) {
-    const scale = Math.min(targetW / img.width, targetH / img.height);
-    const newW = Math.round(img.width * scale);
-    const newH = Math.round(img.height * scale);
-    ctx.fillStyle = '#000';
-    ctx.fillRect(0, 0, targetW, targetH);
-    ctx.drawImage(img, (targetW - newW) / 2, (targetH - newH) / 2, newW, newH);
+    const where = renderWorker ? 'worker' : 'main thread';
+    const blocked = measured.blocked === null ? '' : ` · main thread blocked ${Math.round(measured.blocked)} ms`;
+    console.info(`Render (${where}): ${Math.round(measured.ms)} ms, ${measured.longTasks} long tasks${blocked}`);
+    showToast(`Rendered in ${Math.round(measured.ms)} ms${blocked}`, true);
 }
 
 async function downloadImages() {
@@ -333,40 +403,112 @@ async function downloadImages() {
     const useZip = confirm('Download as ZIP?\n\nOK = ZIP file\nCancel = Individual PNGs');
 
     if (useZip) {
-        showToast('Creating ZIP...');
-        const zip = new JSZip();
-        const folder = zip.folder(`${sourceName}_grid_${gridCount.value}`);
-
-        for (let i = 0; i < tiles.length; i++) {
-            const base64 = tiles[i].toDataURL('image/png').split(',')[1];
-            folder.file(`grid_${String(i + 1).padStart(2, '0')}.png`, base64, { base64: true });
+        const zipName = `${sourceName}_grid_${gridCount.value}.zip`;
+        let writable;
+        try {
+            // Ask for the file first, while the click still counts as a user gesture
+            writable = await openZipFile(zipName);
+        } catch (e) {
+            return;  // save dialog cancelled
         }
 
-        const previewCanvas = createPreviewImage();
-        folder.file('preview_grid.png', previewCanvas.toDataURL('image/png').split(',')[1], { base64: true });
-
-        const content = await zip.generateAsync({ type: 'blob' });
-        const link = document.createElement('a');
-        link.href = URL.createObjectURL(content);
-        link.download = `${sourceName}_grid_${gridCount.value}.zip`;
-        link.click();
+        showToast('Creating ZIP...');
+        try {
+            const blobs = await encodeExport();
+            const folder = `${sourceName}_grid_${gridCount.value}`;
+            const entries = blobs.map((blob, i) => ({ name: `${folder}/${exportFileName(i)}`, blob }));
+            await writeZip(entries, zipName, writable);
+        } catch (e) {
+            // Don't leave a locked, half-written file behind
+            if (writable) await writable.abort().catch(() => {});
+            showToast(e.message);
+            return;
+        }
         showToast('ZIP downloaded!', true);
     } else {
         showToast('Downloading files...');
         const prefix = `${sourceName}_g${gridCount.value}`;
+        let blobs;
+        try {
+            blobs = await encodeExport();
+        } catch (e) {
+            showToast(e.message);
+            return;
+        }
 
         for (let i = 0; i < tiles.length; i++) {
-            await downloadCanvas(tiles[i], `${prefix}_${String(i + 1).padStart(2, '0')}.png`);
+            downloadBlob(blobs[i], `${prefix}_${String(i + 1).padStart(2, '0')}.png`);
             await new Promise(r => setTimeout(r, 300));
         }
 
-        await downloadCanvas(createPreviewImage(), `${prefix}_preview.png`);
+        downloadBlob(blobs[tiles.length], `${prefix}_preview.png`);
         showToast(`Downloaded ${tiles.length + 1} files!`, true);
     }
 }
 
+function canvasToBlob(canvas, type = 'image/png') {
+    if (canvas.convertToBlob) return canvas.convertToBlob({ type });
+    return new Promise((resolve, reject) => {
+        canvas.toBlob(blob => blob ? resolve(blob) : reject(new Error('Could not encode image')), type);
+    });
+}
+
+// Every tile plus the preview as PNG blobs. The encodes run concurrently and
+// off the main thread; no base64 strings are ever built.
+function encodeExport() {
+    return Promise.all([...tiles, createPreviewImage()].map(canvas => canvasToBlob(canvas)));
+}
+
+// Names inside the ZIP, in encodeExport() order
+function exportFileName(i) {
+    return i < tiles.length ? `grid_${String(i + 1).padStart(2, '0')}.png` : 'preview_grid.png';
+}
+
+// A writable file stream where the File System Access API exists, else null.
+// Throws if the user cancels the save dialog.
+async function openZipFile(filename) {
+    if (!window.showSaveFilePicker) return null;
+    let handle;
+    try {
+        handle = await window.showSaveFilePicker({
+            suggestedName: filename,
+            types: [{ description: 'ZIP archive', accept: { 'application/zip': ['.zip'] } }],
+        });
+    } catch (e) {
+        if (e.name === 'AbortError') throw e;
+        return null;
+    }
+    return handle.createWritable();
+}
+
+// Writes the archive (docs/zip.js) as a stream: chunk by chunk into `writable`
+// when given, otherwise into a Blob assembled from the chunks (never one big
+// base64 string).
+async function writeZip(entries, filename, writable) {
+    const chunks = [];
+    // Each chunk is on disk before the next entry is read
+    await writeStoredZip(entries, async chunk => writable ? writable.write(chunk) : chunks.push(chunk));
+
+    if (writable) {
+        await writable.close();
+    } else {
+        downloadBlob(new Blob(chunks, { type: 'application/zip' }), filename);
+    }
+}
+
 // iOS Gallery Modal - allows users to long-press and save each image
-function showImageGallery() {
+async function showImageGallery() {
+    showToast('Preparing images...');
+    let blobs;
+    try {
+        blobs = await encodeExport();
+    } catch (e) {
+        showToast(e.message);
+        return;
+    }
+    // Object URLs point at the encoded blobs; they are revoked when the modal closes
+    const urls = blobs.map(blob => URL.createObjectURL(blob));
+
     // Create modal
     const modal = document.createElement('div');
     modal.id = 'iosGallery';
@@ -397,7 +539,10 @@ function showImageGallery() {
         cursor: pointer;
         z-index: 1001;
     `;
-    closeBtn.onclick = () => modal.remove();
+    closeBtn.onclick = () => {
+        modal.remove();
+        urls.forEach(url => URL.revokeObjectURL(url));
+    };
 
     // Instructions
     const instructions = document.createElement('div');
@@ -423,7 +568,7 @@ function showImageGallery() {
     `;
 
     // Add tiles
-    tiles.forEach((canvas, i) => {
+    urls.slice(0, tiles.length).forEach((url, i) => {
         const wrapper = document.createElement('div');
         wrapper.style.cssText = `
             background: #141414;
@@ -433,7 +578,7 @@ function showImageGallery() {
         `;
 
         const img = document.createElement('img');
-        img.src = canvas.toDataURL('image/png');
+        img.src = url;
         img.style.cssText = 'width: 100%; display: block;';
 
         const label = document.createElement('div');
@@ -466,7 +611,7 @@ function showImageGallery() {
     `;
 
     const previewImg = document.createElement('img');
-    previewImg.src = createPreviewImage().toDataURL('image/png');
+    previewImg.src = urls[tiles.length];
     previewImg.style.cssText = 'width: 100%; display: block;';
 
     const previewLabel = document.createElement('div');
@@ -495,31 +640,31 @@ function showImageGallery() {
     showToast('Long-press images to save', true);
 }
 
-function downloadCanvas(canvas, filename) {
-    return new Promise(resolve => {
-        canvas.toBlob(blob => {
-            const link = document.createElement('a');
-            link.href = URL.createObjectURL(blob);
-            link.download = filename;
-            link.click();
-            URL.revokeObjectURL(link.href);
-            resolve();
-        }, 'image/png');
-    });
+function downloadBlob(blob, filename) {
+    const link = document.createElement('a');
+    link.href = URL.createObjectURL(blob);
+    link.download = filename;
+    link.click();
+    // Revoking right after click() can cancel the download in some browsers
+    setTimeout(() => URL.revokeObjectURL(link.href), 10000);
 }
 
+// The whole grid, PREVIEW_EXPORT_WIDTH px wide
 function createPreviewImage() {
     const count = parseInt(gridCount.value);
     const rows = count / 3, cols = 3;
+    const scale = PREVIEW_EXPORT_WIDTH / (cols * POST_W);
+    const cellW = Math.round(POST_W * scale), cellH = Math.round(POST_H * scale);
     const canvas = document.createElement('canvas');
-    canvas.width = cols * POST_W;
-    canvas.height = rows * POST_H;
+    canvas.width = cols * cellW;
+    canvas.height = rows * cellH;
     const ctx = canvas.getContext('2d');
     ctx.fillStyle = '#000';
     ctx.fillRect(0, 0, canvas.width, canvas.height);
+    ctx.imageSmoothingQuality = 'high';
 
     for (let i = 0; i < tiles.length; i++) {
-        ctx.drawImage(tiles[i], (i % cols) * POST_W, Math.floor(i / cols) * POST_H);
+        ctx.drawImage(tiles[i], (i % cols) * cellW, Math.floor(i / cols) * cellH, cellW, cellH);
     }
     return canvas;
 }
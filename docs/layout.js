@@ -0,0 +1,191 @@
+// Grid geometry shared with the Python engine (innie_engine.LayoutPlan).
+// compileLayoutPlan() returns the same structure as LayoutPlan.to_dict(), so a
+// plan exported with `python innie.py plan` can be used here as-is.
+// tools/check_layout.py verifies both sides produce identical geometry.
+
+const LAYOUT_POST_W = 1080;
+const LAYOUT_POST_H = 1350;
+const LAYOUT_COLS = 3;
+const LAYOUT_PLAN_VERSION = 1;
+
+// Python's round(): halves go to the even neighbour
+function roundHalfEven(x) {
+    const r = Math.round(x);
+    return (Math.abs(x % 1) === 0.5 && r % 2 !== 0) ? r - 1 : r;
+}
+
+function scaled(value, scale) {
+    return roundHalfEven(value * scale);
+}
+
+function normalizeSettings(settings) {
+    const s = {
+        grid_count: settings.grid_count,
+        margin_tb: settings.margin_tb,
+        margin_side: settings.margin_side,
+        frame_enabled: settings.frame_enabled,
+        frame_thickness: settings.frame_enabled ? settings.frame_thickness : 0,
+        frame_style: settings.frame_style,
+        mode: settings.mode,
+        edge_margin: settings.edge_margin,
+    };
+    if (s.grid_count < LAYOUT_COLS || s.grid_count % LAYOUT_COLS !== 0) {
+        throw new Error(`Grid count must be a multiple of ${LAYOUT_COLS}`);
+    }
+    return s;
+}
+
+// postSize is the full-size post, [1080, 1350] for the feed; scale shrinks everything from there
+function computeLayout(settings, scale = 1, postSize = [LAYOUT_POST_W, LAYOUT_POST_H]) {
+    const cols = LAYOUT_COLS;
+    const rows = settings.grid_count / cols;
+
+    const [fullW, fullH] = postSize;
+
+    if (settings.margin_side * 2 >= fullW) throw new Error('Side margins too large');
+    if (rows === 1 && settings.margin_tb * 2 >= fullH) throw new Error('Top/bottom margins too large');
+
+    const postW = scaled(fullW, scale), postH = scaled(fullH, scale);
+    const Ms = scaled(settings.margin_side, scale), Mt = scaled(settings.margin_tb, scale);
+    let edgeMargin = scaled(settings.edge_margin, scale);
+    let frameThickness = scaled(settings.frame_thickness, scale);
+    // Keep thin frames and edge gaps visible when scaled down
+    if (settings.edge_margin > 0) edgeMargin = Math.max(1, edgeMargin);
+    if (settings.frame_thickness > 0) frameThickness = Math.max(1, frameThickness);
+
+    const contentWidths = [];
+    for (let c = 0; c < cols; c++) {
+        contentWidths.push(postW - (c === 0 ? Ms : 0) - (c === cols - 1 ? Ms : 0));
+    }
+    const contentHeights = [];
+    for (let r = 0; r < rows; r++) {
+        const topM = (rows === 1 || r === 0) ? Mt : 0;
+        const bottomM = (rows === 1 || r === rows - 1) ? Mt : 0;
+        contentHeights.push(postH - topM - bottomM);
+    }
+
+    // Edge tiles padding: col 0 gets RIGHT padding, col 2 gets LEFT padding,
+    // the middle column gets both
+    const edgePadding = [];
+    for (let c = 0; c < cols; c++) {
+        let padLeft = c === cols - 1 ? edgeMargin : 0;
+        let padRight = c === 0 ? edgeMargin : 0;
+        if (c === 1) {
+            padLeft = edgeMargin;
+            padRight = edgeMargin;
+        }
+        edgePadding.push({ pad_left: padLeft, pad_right: padRight });
+    }
+
+    // Actual image content = content area minus edge padding
+    const actualContentWidths = contentWidths.map((w, c) => w - edgePadding[c].pad_left - edgePadding[c].pad_right);
+    if (Math.min(...actualContentWidths) <= 0) throw new Error('Edge margin too large');
+
+    const sum = (values) => values.reduce((a, b) => a + b, 0);
+    return {
+        cols,
+        rows,
+        post_w: postW,
+        post_h: postH,
+        margin_side: Ms,
+        margin_tb: Mt,
+        frame_thickness: frameThickness,
+        content_widths: contentWidths,
+        content_heights: contentHeights,
+        edge_padding: edgePadding,
+        actual_content_widths: actualContentWidths,
+        W_visible: sum(actualContentWidths),
+        H_visible: sum(contentHeights),
+        cum_w: actualContentWidths.map((_, i) => sum(actualContentWidths.slice(0, i))),
+        cum_h: contentHeights.map((_, i) => sum(contentHeights.slice(0, i))),
+    };
+}
+
+// Where a fit-mode resize puts the image inside the letterbox: [x, y, w, h]
+function fitPlacement(srcW, srcH, targetW, targetH) {
+    const scale = Math.min(targetW / srcW, targetH / srcH);
+    const newW = roundHalfEven(srcW * scale), newH = roundHalfEven(srcH * scale);
+    return [Math.floor((targetW - newW) / 2), Math.floor((targetH - newH) / 2), newW, newH];
+}
+
+// Frame sides as inclusive [x0, y0, x1, y1] rectangles `thickness` px into `box`
+function frameRects(box, thickness, top, bottom, left, right) {
+    const [fl, ft, fr, fb] = box;
+    const rects = [];
+    if (top) rects.push([fl, ft, fr, ft + thickness - 1]);
+    if (bottom) rects.push([fl, fb - thickness + 1, fr, fb]);
+    if (left) rects.push([fl, ft, fl + thickness - 1, fb]);
+    if (right) rects.push([fr - thickness + 1, ft, fr, fb]);
+    return rects;
+}
+
+// Per-tile source slice, paste offset and frame rects. Without `fitRect`, fit-mode
+// individual frames are left as null (they depend on the source's aspect ratio).
+function tileSpecs(layout, settings, fitRect = null) {
+    const { cols, rows, margin_side: Ms, margin_tb: Mt, frame_thickness: thickness } = layout;
+    const specs = [];
+    let index = 1;
+    for (let r = 0; r < rows; r++) {
+        for (let c = 0; c < cols; c++) {
+            const x0 = layout.cum_w[c], y0 = layout.cum_h[r];
+            const srcW = layout.actual_content_widths[c], srcH = layout.content_heights[r];
+            const topM = (rows === 1 || r === 0) ? Mt : 0;
+            const leftM = c === 0 ? Ms : 0;
+            const ePadLeft = layout.edge_padding[c].pad_left;
+            const drawX = leftM + ePadLeft;
+            const cw = layout.content_widths[c], ch = layout.content_heights[r];
+            // Skip frame on sides where edge margin is applied
+            const skipLeft = ePadLeft > 0;
+            const skipRight = layout.edge_padding[c].pad_right > 0;
+
+            let rects = [];
+            if (settings.frame_enabled && thickness > 0) {
+                let box = null;
+                if (settings.frame_style === 'individual' && settings.mode === 'fit') {
+                    // Fit mode: frame around actual image bounds, only on outer edges
+                    if (fitRect === null) {
+                        rects = null;
+                    } else {
+                        const [fx, fy, fw, fh] = fitRect;
+                        const ix0 = Math.max(fx, x0) - x0, iy0 = Math.max(fy, y0) - y0;
+                        const ix1 = Math.min(fx + fw, x0 + srcW) - x0, iy1 = Math.min(fy + fh, y0 + srcH) - y0;
+                        if (ix1 > ix0 && iy1 > iy0) box = [drawX + ix0, topM + iy0, drawX + ix1 - 1, topM + iy1 - 1];
+                    }
+                } else {
+                    // Outer frame / individual cover: frame around content area, only on outer edges
+                    box = [leftM, topM, leftM + cw - 1, topM + ch - 1];
+                }
+                if (box) {
+                    rects = frameRects(box, thickness, r === 0, r === rows - 1,
+                                       c === 0 && !skipLeft, c === cols - 1 && !skipRight);
+                }
+            }
+
+            specs.push({
+                index, row: r, col: c,
+                x0, y0, src_w: srcW, src_h: srcH,
+                offset: [drawX, topM], rects,
+            });
+            index++;
+        }
+    }
+    return specs;
+}
+
+function compileLayoutPlan(settings, scale = 1, postSize = [LAYOUT_POST_W, LAYOUT_POST_H]) {
+    const s = normalizeSettings(settings);
+    const layout = computeLayout(s, scale, postSize);
+    return { version: LAYOUT_PLAN_VERSION, settings: s, scale, layout, tiles: tileSpecs(layout, s) };
+}
+
+// Tile specs for a source of srcW×srcH: the compiled ones unless frames follow the image
+function planTilesFor(plan, srcW, srcH) {
+    if (plan.version !== LAYOUT_PLAN_VERSION) throw new Error(`Unsupported layout plan version: ${plan.version}`);
+    if (!plan.tiles.some(spec => spec.rects === null)) return plan.tiles;
+    const fitRect = fitPlacement(srcW, srcH, plan.layout.W_visible, plan.layout.H_visible);
+    return tileSpecs(plan.layout, plan.settings, fitRect);
+}
+
+if (typeof module !== 'undefined') {
+    module.exports = { compileLayoutPlan, planTilesFor, fitPlacement, computeLayout, tileSpecs, roundHalfEven };
+}
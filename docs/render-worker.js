@@ -0,0 +1,58 @@
+// Renders grid tiles off the main thread. app.js sends the decoded source once
+// as an ImageBitmap, then one message per render; tiles come back as
+// transferred ImageBitmaps, so nothing is copied or encoded on the way.
+//
+//   → { type: 'source', bitmap }
+//   → { type: 'render', id, settings }
+//   ← { type: 'rendered', id, tiles: [{ index, bitmap }], ms }
+//   ← { type: 'error', id, message }
+
+importScripts('layout.js', 'render.js');
+
+let source = null;
+// Resized source for the last W_visible × H_visible × mode; frame edits reuse it
+let resized = null;
+let resizedKey = '';
+
+const createCanvas = (w, h) => new OffscreenCanvas(w, h);
+
+function render(id, settings) {
+    const start = performance.now();
+    const plan = compileLayoutPlan(settings);
+    const { W_visible, H_visible, post_w: postW, post_h: postH } = plan.layout;
+
+    const key = `${W_visible}x${H_visible}:${plan.settings.mode}`;
+    if (key !== resizedKey) {
+        resized = resizeSource(source, plan, createCanvas);
+        resizedKey = key;
+    }
+
+    // One canvas for every tile: transferToImageBitmap() hands its pixels over and leaves it blank
+    const canvas = createCanvas(postW, postH);
+    const ctx = canvas.getContext('2d');
+    const tiles = [];
+    for (const spec of planTilesFor(plan, source.width, source.height)) {
+        drawTile(ctx, resized, spec, postW, postH);
+        tiles.push({ index: spec.index, bitmap: canvas.transferToImageBitmap() });
+    }
+
+    self.postMessage({ type: 'rendered', id, tiles, ms: performance.now() - start },
+                     tiles.map(tile => tile.bitmap));
+}
+
+self.onmessage = (e) => {
+    const msg = e.data;
+    if (msg.type === 'source') {
+        if (source) source.close();
+        source = msg.bitmap;
+        resized = null;
+        resizedKey = '';
+    } else if (msg.type === 'render') {
+        try {
+            if (!source) throw new Error('No source image');
+            render(msg.id, msg.settings);
+        } catch (err) {
+            self.postMessage({ type: 'error', id: msg.id, message: err.message });
+        }
+    }
+};
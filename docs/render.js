@@ -0,0 +1,46 @@
+// Tile compositing shared by the render worker (render-worker.js) and the
+// main-thread fallback in app.js. Works on HTML canvases and OffscreenCanvas
+// alike; `createCanvas(w, h)` decides which.
+
+function resizeCover(ctx, img, targetW, targetH) {
+    const scale = Math.max(targetW / img.width, targetH / img.height);
+    const newW = Math.ceil(img.width * scale);
+    const newH = Math.ceil(img.height * scale);
+    ctx.drawImage(img, -(newW - targetW) / 2, -(newH - targetH) / 2, newW, newH);
+}
+
+function resizeFit(ctx, img, targetW, targetH) {
+    // Same whole-pixel placement the plan uses for fit-mode frame bounds
+    const [x, y, newW, newH] = fitPlacement(img.width, img.height, targetW, targetH);
+    ctx.fillStyle = '#000';
+    ctx.fillRect(0, 0, targetW, targetH);
+    ctx.drawImage(img, x, y, newW, newH);
+}
+
+// The source resized to the plan's visible area
+function resizeSource(source, plan, createCanvas) {
+    const { W_visible, H_visible } = plan.layout;
+    const canvas = createCanvas(W_visible, H_visible);
+    const ctx = canvas.getContext('2d');
+    if (plan.settings.mode === 'cover') {
+        resizeCover(ctx, source, W_visible, H_visible);
+    } else {
+        resizeFit(ctx, source, W_visible, H_visible);
+    }
+    return canvas;
+}
+
+function drawTile(ctx, resized, spec, postW, postH) {
+    ctx.fillStyle = '#000';
+    ctx.fillRect(0, 0, postW, postH);
+
+    // Draw image shifted by edge padding (leaves black margin on edge)
+    const [drawX, topM] = spec.offset;
+    ctx.drawImage(resized, spec.x0, spec.y0, spec.src_w, spec.src_h, drawX, topM, spec.src_w, spec.src_h);
+
+    // Frame sides on the grid's outer edges, as inclusive rectangles
+    ctx.fillStyle = '#fff';
+    for (const [x0, y0, x1, y1] of spec.rects) {
+        ctx.fillRect(x0, y0, x1 - x0 + 1, y1 - y0 + 1);
+    }
+}
@@ -0,0 +1,61 @@
+// Offline-first service worker for the web app.
+//
+// The app shell, ZIP writer included, is precached on install, so repeat
+// visits start from cache and work without a network. Same-origin files are
+// served from cache and refreshed in the background (stale-while-revalidate);
+// the next visit picks up the new copy. Fonts have versioned URLs and are
+// cached the first time they load.
+//
+// Bump CACHE_VERSION when the list of precached files changes.
+
+const CACHE_VERSION = 3;
+const CACHE_NAME = `innie-v${CACHE_VERSION}`;
+const APP_SHELL = ['./', 'index.html', 'app.js', 'layout.js', 'render.js', 'render-worker.js', 'zip.js'];
+const RUNTIME_HOSTS = ['fonts.googleapis.com', 'fonts.gstatic.com'];
+
+self.addEventListener('install', (e) => {
+    e.waitUntil(caches.open(CACHE_NAME).then(cache => cache.addAll(APP_SHELL)).then(() => self.skipWaiting()));
+});
+
+self.addEventListener('activate', (e) => {
+    e.waitUntil(caches.keys().then(keys => Promise.all(
+        keys.filter(key => key.startsWith('innie-') && key !== CACHE_NAME).map(key => caches.delete(key))
+    )).then(() => self.clients.claim()));
+});
+
+self.addEventListener('fetch', (e) => {
+    const request = e.request;
+    if (request.method !== 'GET') return;
+    const url = new URL(request.url);
+
+    if (url.origin === self.location.origin) {
+        e.respondWith(staleWhileRevalidate(e, request));
+    } else if (RUNTIME_HOSTS.includes(url.hostname)) {
+        e.respondWith(cacheFirst(request));
+    }
+});
+
+async function staleWhileRevalidate(e, request) {
+    const cache = await caches.open(CACHE_NAME);
+    // ?render=main and friends still get the cached page
+    const cached = await cache.match(request, { ignoreSearch: request.mode === 'navigate' });
+    const refresh = fetch(request).then((response) => {
+        if (response.ok) cache.put(request, response.clone());
+        return response;
+    });
+    if (cached) {
+        e.waitUntil(refresh.catch(() => {}));
+        return cached;
+    }
+    return refresh;
+}
+
+async function cacheFirst(request) {
+    const cache = await caches.open(CACHE_NAME);
+    const cached = await cache.match(request);
+    if (cached) return cached;
+    const response = await fetch(request);
+    // Cross-origin stylesheets/scripts without CORS come back opaque (status 0); still cacheable
+    if (response.ok || response.type === 'opaque') cache.put(request, response.clone());
+    return response;
+}
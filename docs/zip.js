@@ -0,0 +1,95 @@
+// Self-hosted ZIP writer for the web app's downloads. The tiles are PNGs,
+// which are already compressed, so every entry is stored as-is (method 0,
+// STORE) and no deflate implementation is needed. Entries are written one at
+// a time through `write(chunk)`, so an archive can stream straight into a file.
+
+const ZIP_CRC_TABLE = (() => {
+    const table = new Uint32Array(256);
+    for (let n = 0; n < 256; n++) {
+        let c = n;
+        for (let k = 0; k < 8; k++) c = c & 1 ? 0xEDB88320 ^ (c >>> 1) : c >>> 1;
+        table[n] = c >>> 0;
+    }
+    return table;
+})();
+const ZIP_VERSION = 20;        // 2.0: plain stored entries
+const ZIP_UTF8_NAMES = 0x0800;
+
+function crc32(bytes) {
+    let crc = 0xFFFFFFFF;
+    for (let i = 0; i < bytes.length; i++) crc = ZIP_CRC_TABLE[(crc ^ bytes[i]) & 0xFF] ^ (crc >>> 8);
+    return (crc ^ 0xFFFFFFFF) >>> 0;
+}
+
+// MS-DOS time and date, as ZIP headers store them
+function dosDateTime(date) {
+    const time = (date.getHours() << 11) | (date.getMinutes() << 5) | (date.getSeconds() >> 1);
+    const day = ((date.getFullYear() - 1980) << 9) | ((date.getMonth() + 1) << 5) | date.getDate();
+    return [time, day];
+}
+
+function zipRecord(size, fields) {
+    const bytes = new Uint8Array(size);
+    const view = new DataView(bytes.buffer);
+    let pos = 0;
+    for (const [width, value] of fields) {
+        if (width === 4) view.setUint32(pos, value, true);
+        else view.setUint16(pos, value, true);
+        pos += width;
+    }
+    return { bytes, pos };
+}
+
+function localFileHeader(name, crc, size, time, day) {
+    const { bytes, pos } = zipRecord(30 + name.length, [
+        [4, 0x04034B50], [2, ZIP_VERSION], [2, ZIP_UTF8_NAMES], [2, 0], [2, time], [2, day],
+        [4, crc], [4, size], [4, size], [2, name.length], [2, 0],
+    ]);
+    bytes.set(name, pos);
+    return bytes;
+}
+
+function centralDirectoryHeader(name, crc, size, time, day, offset) {
+    const { bytes, pos } = zipRecord(46 + name.length, [
+        [4, 0x02014B50], [2, ZIP_VERSION], [2, ZIP_VERSION], [2, ZIP_UTF8_NAMES], [2, 0], [2, time], [2, day],
+        [4, crc], [4, size], [4, size], [2, name.length], [2, 0], [2, 0], [2, 0], [2, 0], [4, 0], [4, offset],
+    ]);
+    bytes.set(name, pos);
+    return bytes;
+}
+
+// Writes `entries` ([{ name, blob }]) as a stored ZIP archive through the
+// async `write(Uint8Array)`. Only one entry's bytes are in memory at a time.
+// Archives stay under 4 GB, so no ZIP64 records are needed.
+async function writeStoredZip(entries, write) {
+    const encoder = new TextEncoder();
+    const [time, day] = dosDateTime(new Date());
+    const directory = [];
+    let offset = 0;
+
+    for (const { name, blob } of entries) {
+        const nameBytes = encoder.encode(name);
+        const data = new Uint8Array(await blob.arrayBuffer());
+        const crc = crc32(data);
+        const header = localFileHeader(nameBytes, crc, data.length, time, day);
+        await write(header);
+        await write(data);
+        directory.push(centralDirectoryHeader(nameBytes, crc, data.length, time, day, offset));
+        offset += header.length + data.length;
+    }
+
+    let directorySize = 0;
+    for (const record of directory) {
+        await write(record);
+        directorySize += record.length;
+    }
+    const { bytes: end } = zipRecord(22, [
+        [4, 0x06054B50], [2, 0], [2, 0], [2, entries.length], [2, entries.length],
+        [4, directorySize], [4, offset], [2, 0],
+    ]);
+    await write(end);
+}
+
+if (typeof module !== 'undefined') {
+    module.exports = { writeStoredZip, crc32 };
+}
@@ -0,0 +1,346 @@
+"""
+Innie command line.
+
+    python innie.py batch photos/                 # every image in a folder
+    python innie.py batch "campaign/*.jpg" -w 8   # a glob, 8 worker processes
+    python innie.py batch photos/ --cache         # serve unchanged exports from the cache
+    python innie.py batch photos/ --post feed,square,story   # one folder per post format
+    python innie.py cache stats                   # export cache size and location
+    python innie.py watch inbox/ -o exports/      # split whatever lands in inbox/
+    python innie.py plan -g 9 -o plan.json        # compiled layout geometry as JSON
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from PIL import Image
+
+from innie_cache import DEFAULT_MAX_BYTES, ExportCache
+from innie_engine import (BACKENDS, IMAGE_EXTENSIONS, POST_FORMATS, LayoutPlan, OutputProfile, TileSettings,
+                          process_image, process_image_formats, resolve_post_size)
+from innie_timing import JsonLinesSink, StatsSink, tracer
+from innie_watch import InboxWatcher
+
+
+def collect_sources(patterns):
+    """Expand directories and globs into a sorted, de-duplicated list of image paths."""
+    sources = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            candidates = [os.path.join(pattern, name) for name in os.listdir(pattern)]
+        else:
+            candidates = glob.glob(pattern)
+        for path in candidates:
+            if os.path.isfile(path) and path.lower().endswith(IMAGE_EXTENSIONS):
+                sources.append(os.path.abspath(path))
+    return sorted(set(sources))
+
+
+def add_settings_arguments(parser):
+    parser.add_argument("-g", "--grid", type=int, default=6,
+                        help="grid count, any multiple of 3 (default: 6; 3/6/9 are the usual sizes)")
+    parser.add_argument("--mode", default="cover", choices=("cover", "fit"), help="cover crops to fill, fit letterboxes")
+    parser.add_argument("--margin-tb", type=int, default=80, help="top/bottom margin in px (default: 80)")
+    parser.add_argument("--margin-side", type=int, default=80, help="left/right margin in px (default: 80)")
+    parser.add_argument("--no-frame", action="store_true", help="disable the frame")
+    parser.add_argument("--frame-style", default="outer", choices=("outer", "individual"))
+    parser.add_argument("--frame-thickness", type=int, default=4, help="frame thickness in px (default: 4)")
+    parser.add_argument("--edge-margin", type=int, default=0, help="edge tiles margin in px (default: off)")
+
+
+def add_output_arguments(parser):
+    parser.add_argument("-f", "--format", default="png", choices=sorted(OutputProfile.FORMATS),
+                        help="output format (default: png)")
+    parser.add_argument("--compress-level", type=int, default=6, help="PNG compress level 0-9 (default: 6)")
+    parser.add_argument("--quality", type=int, default=95, help="JPEG/WebP quality 1-100 (default: 95)")
+    parser.add_argument("--subsampling", default="4:4:4", choices=("4:4:4", "4:2:2", "4:2:0"),
+                        help="JPEG chroma subsampling (default: 4:4:4)")
+    parser.add_argument("--lossless", action="store_true", help="lossless WebP")
+
+
+def profile_from_args(args):
+    return OutputProfile(
+        format=args.format,
+        compress_level=args.compress_level,
+        quality=args.quality,
+        subsampling=args.subsampling,
+        lossless=args.lossless,
+    )
+
+
+def settings_from_args(args):
+    return TileSettings(
+        grid_count=args.grid,
+        margin_tb=args.margin_tb,
+        margin_side=args.margin_side,
+        frame_enabled=not args.no_frame,
+        frame_thickness=args.frame_thickness,
+        frame_style=args.frame_style,
+        mode=args.mode,
+        edge_margin=args.edge_margin,
+    )
+
+
+def parse_post_sizes(value):
+    """``"feed,square"`` or ``"1080x1200"`` → list of (width, height), duplicates dropped."""
+    sizes = []
+    for part in value.split(","):
+        part = part.strip().lower()
+        if "x" in part:
+            w, h = part.split("x", 1)
+            try:
+                part = (int(w), int(h))
+            except ValueError:
+                raise ValueError(f"Invalid post size: {part}")
+        sizes.append(resolve_post_size(part))
+    return list(dict.fromkeys(sizes))
+
+
+def _init_worker(trace_path, stream=False):
+    if trace_path:
+        tracer.add_sink(JsonLinesSink(trace_path))
+    if stream:
+        # Streaming is for panoramas and scans past Pillow's decompression-bomb limit
+        Image.MAX_IMAGE_PIXELS = None
+
+
+def add_cache_arguments(parser):
+    parser.add_argument("--cache-dir", default=None, help="export cache location (default: ~/.cache/innie/exports)")
+    parser.add_argument("--cache-max-mb", type=int, default=DEFAULT_MAX_BYTES // 2**20,
+                        help=f"export cache size cap in MB (default: {DEFAULT_MAX_BYTES // 2**20})")
+
+
+def cache_from_args(args):
+    return ExportCache(args.cache_dir, args.cache_max_mb * 2**20)
+
+
+def _batch_worker(path, settings, out_dir, reduced_decode, profile, backend, cache, stream, post_sizes):
+    # Runs in a worker process: never let one bad image take down the pool.
+    try:
+        if len(post_sizes) > 1:
+            result = process_image_formats(path, settings, post_sizes, out_dir, reduced_decode, profile, backend, cache,
+                                           stream)
+        else:
+            result = process_image(path, settings, out_dir, reduced_decode, profile, backend, cache, stream,
+                                   post_sizes[0])
+        result["ok"] = True
+        return result
+    except Exception as e:
+        return {"source": path, "ok": False, "error": f"{type(e).__name__}: {e}", "tiles": 0}
+
+
+def run_batch(sources, settings, workers=None, out_dir=None, reduced_decode=True, profile=None, backend=None,
+              trace_path=None, cache=None, stream=False, post_sizes=None):
+    """Split every source across a process pool. Returns the list of per-image results.
+
+    Several ``post_sizes`` export each source once per post format, sharing decodes where they match.
+    """
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+    post_sizes = post_sizes or [POST_FORMATS["feed"]]
+
+    results = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(trace_path, stream)) as pool:
+        futures = {pool.submit(_batch_worker, path, settings, out_dir, reduced_decode, profile, backend, cache,
+                               stream, post_sizes): path for path in sources}
+        for done, future in enumerate(as_completed(futures), 1):
+            path = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                # The worker process itself died (e.g. killed for memory).
+                result = {"source": path, "ok": False, "error": f"{type(e).__name__}: {e}", "tiles": 0}
+            results.append(result)
+
+            name = os.path.basename(path)
+            if result["ok"]:
+                cached = ", cached" if result.get("cached") else ""
+                folders = ", ".join(os.path.basename(folder) for folder in result.get("folders", [result["folder"]]))
+                print(f"[{done}/{len(sources)}] ✓ {name} → {folders} ({result['seconds']:.2f}s{cached})")
+            else:
+                print(f"[{done}/{len(sources)}] ✗ {name}: {result['error']}")
+    return results
+
+
+def print_stage_summary(trace_path):
+    """Aggregate a JSON lines trace into per-stage totals."""
+    stats = StatsSink()
+    with open(trace_path, "r", encoding="utf-8") as f:
+        for line in f:
+            stats(json.loads(line))
+    print(f"\n  {'stage':<12} {'count':>6} {'total s':>9} {'mean ms':>9}")
+    for name, s in sorted(stats.summary().items(), key=lambda item: -item[1]["total"]):
+        print(f"  {name:<12} {s['count']:>6} {s['total']:>9.2f} {s['mean'] * 1000:>9.1f}")
+
+
+def cmd_batch(args):
+    sources = collect_sources(args.sources)
+    if not sources:
+        print("Error: No images found.")
+        return 1
+
+    try:
+        settings = settings_from_args(args)
+        profile = profile_from_args(args)
+        post_sizes = parse_post_sizes(args.post)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return 1
+
+    cache = cache_from_args(args) if args.cache else None
+    workers = args.workers or os.cpu_count() or 1
+    formats = "" if len(post_sizes) == 1 else f" in {len(post_sizes)} post formats"
+    print(f"Splitting {len(sources)} images into {settings.grid_count} tiles{formats} with {workers} workers...\n")
+
+    if args.trace:
+        open(args.trace, "w").close()
+    start = time.perf_counter()
+    results = run_batch(sources, settings, workers, args.out, not args.full_decode, profile, args.backend, args.trace,
+                        cache, args.stream, post_sizes)
+    elapsed = time.perf_counter() - start
+
+    ok = [r for r in results if r["ok"]]
+    tiles = sum(r["tiles"] for r in ok)
+    print(f"\n✓ {len(ok)}/{len(results)} images, {tiles} tiles in {elapsed:.2f}s")
+    print(f"  {len(ok) / elapsed:.2f} images/s, {tiles / elapsed:.2f} tiles/s")
+    if cache is not None:
+        hits = sum(1 for r in ok if r.get("cached"))
+        stats = cache.stats()
+        print(f"  cache: {hits} hits, {len(ok) - hits} misses · {stats['entries']} entries, "
+              f"{stats['bytes'] / 2**20:.0f}/{stats['max_bytes'] / 2**20:.0f} MB")
+    if args.trace:
+        print_stage_summary(args.trace)
+    failed = len(results) - len(ok)
+    if failed:
+        print(f"✗ {failed} failed")
+        return 1
+    return 0
+
+
+def cmd_plan(args):
+    try:
+        post_sizes = parse_post_sizes(args.post)
+        if len(post_sizes) != 1:
+            raise ValueError("A layout plan is for one post format")
+        plan = LayoutPlan.compile(settings_from_args(args), args.scale, post_sizes[0])
+    except ValueError as e:
+        print(f"Error: {e}")
+        return 1
+    text = json.dumps(plan.to_dict(), indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        print(f"✓ Layout plan written to {args.out}")
+    else:
+        print(text)
+    return 0
+
+
+def cmd_cache(args):
+    cache = cache_from_args(args)
+    if args.action == "clear":
+        removed = cache.clear()
+        print(f"✓ Removed {removed} cached exports from {cache.root}")
+        return 0
+    stats = cache.stats()
+    print(f"Export cache: {stats['root']}")
+    print(f"  {stats['entries']} entries, {stats['bytes'] / 2**20:.1f} MB of {stats['max_bytes'] / 2**20:.0f} MB")
+    return 0
+
+
+def cmd_watch(args):
+    if not os.path.isdir(args.inbox):
+        print(f"Error: {args.inbox} is not a directory")
+        return 1
+    try:
+        settings = settings_from_args(args)
+        profile = profile_from_args(args)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return 1
+    if args.out:
+        os.makedirs(args.out, exist_ok=True)
+
+    watcher = InboxWatcher(
+        args.inbox, settings, profile,
+        out_dir=args.out,
+        workers=args.workers,
+        backend=args.backend,
+        cache=cache_from_args(args) if args.cache else None,
+        debounce=args.debounce,
+        interval=args.interval,
+        polling=args.poll,
+        status_path=args.status,
+    )
+    return watcher.run(once=args.once)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="innie", description="Innie — Instagram Grid Splitter")
+    sub = parser.add_subparsers(dest="command")
+    sub.required = True
+
+    batch = sub.add_parser("batch", help="split many images using a process pool")
+    batch.add_argument("sources", nargs="+", help="image files, directories or glob patterns")
+    batch.add_argument("-w", "--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    batch.add_argument("-o", "--out", default=None, help="output directory (default: next to each source)")
+    batch.add_argument("--backend", default=None, choices=BACKENDS,
+                       help="compose backend (default: numpy when installed, else pillow)")
+    batch.add_argument("--trace", metavar="FILE", help="write per-stage timings as JSON lines and summarize them")
+    batch.add_argument("--full-decode", action="store_true",
+                       help="decode sources at native resolution instead of only what the grid needs")
+    batch.add_argument("--cache", action="store_true", help="reuse exports of unchanged sources and settings")
+    batch.add_argument("--stream", action="store_true",
+                       help="render and write one row of tiles at a time (huge sources, tall grids)")
+    batch.add_argument("--post", default="feed", metavar="FORMATS",
+                       help="post formats, comma-separated: feed (1080×1350), square, story (1080×1920) or WxH; "
+                            "several are rendered in parallel from one decode (default: feed)")
+    add_cache_arguments(batch)
+    add_settings_arguments(batch)
+    add_output_arguments(batch)
+    batch.set_defaults(func=cmd_batch)
+
+    watch = sub.add_parser("watch", help="split every image that appears or changes in an inbox folder")
+    watch.add_argument("inbox", help="folder to watch")
+    watch.add_argument("-w", "--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    watch.add_argument("-o", "--out", default=None, help="output directory (default: inside the inbox)")
+    watch.add_argument("--backend", default=None, choices=BACKENDS,
+                       help="compose backend (default: numpy when installed, else pillow)")
+    watch.add_argument("--debounce", type=float, default=2.0,
+                       help="seconds a file must stay unchanged before it is rendered (default: 2)")
+    watch.add_argument("--interval", type=float, default=1.0, help="polling interval in seconds (default: 1)")
+    watch.add_argument("--poll", action="store_true", help="poll even when inotify is available")
+    watch.add_argument("--status", metavar="FILE", help="keep queue depth and latency metrics in this JSON file")
+    watch.add_argument("--once", action="store_true", help="process the current inbox and exit")
+    watch.add_argument("--cache", action="store_true", help="reuse exports of unchanged sources and settings")
+    add_cache_arguments(watch)
+    add_settings_arguments(watch)
+    add_output_arguments(watch)
+    watch.set_defaults(func=cmd_watch)
+
+    plan = sub.add_parser("plan", help="print the compiled layout plan (the geometry docs/layout.js shares)")
+    plan.add_argument("-o", "--out", default=None, help="write the JSON here instead of stdout")
+    plan.add_argument("--scale", type=float, default=1.0, help="post size relative to full size (default: 1)")
+    plan.add_argument("--post", default="feed", help="post format: feed, square, story or WxH (default: feed)")
+    add_settings_arguments(plan)
+    plan.set_defaults(func=cmd_plan)
+
+    cache = sub.add_parser("cache", help="inspect or clear the export cache")
+    cache.add_argument("action", choices=("stats", "clear"))
+    add_cache_arguments(cache)
+    cache.set_defaults(func=cmd_cache)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,196 @@
+"""
+On-disk, content-addressed cache of exported grids.
+
+An export is keyed by a hash of the source bytes plus everything that changes
+the output pixels or encoding: the normalized TileSettings, the OutputProfile
+and the decode size. A hit is served by copying the cached files into the
+output folder, so rerunning an unchanged job skips decode, resize, compose and
+encode entirely. Outputs are never linked to the cache: editing one in place
+(rotating a tile, running an optimizer) leaves the cached entry intact.
+
+    cache = ExportCache()                    # ~/.cache/innie/exports, 2 GB cap
+    key = cache.key(path, settings, profile, max_size)
+    paths = cache.restore(key, folder)       # None on a miss
+    if paths is None:
+        paths = export_tiles(...)
+        cache.store(key, paths)
+
+Entries are evicted least-recently-used first once the cache grows past
+``max_bytes``. Bump CACHE_VERSION whenever rendering output changes.
+"""
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+
+CACHE_VERSION = 4
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+ENTRY_FILE = "entry.json"
+HASH_CHUNK = 1024 * 1024
+
+
+def default_cache_dir():
+    """$INNIE_CACHE_DIR, else $XDG_CACHE_HOME/innie/exports, else ~/.cache/innie/exports."""
+    if os.environ.get("INNIE_CACHE_DIR"):
+        return os.environ["INNIE_CACHE_DIR"]
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "innie", "exports")
+
+
+def hash_file(path):
+    """SHA-256 of a file's bytes, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def export_key(source_path, settings, profile, max_size=None, stream=False, post_size=None):
+    """Content hash of one export: source bytes, settings, profile, decode size, post size and render path."""
+    params = {
+        "version": CACHE_VERSION,
+        "source": hash_file(source_path),
+        "settings": settings.to_dict(),
+        "profile": profile.to_dict(),
+        "max_size": list(max_size) if max_size else None,
+        "post_size": list(post_size) if post_size else None,
+    }
+    if stream:
+        # Streamed exports differ by rounding and have a smaller preview
+        params["stream"] = True
+    blob = json.dumps(params, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(blob).hexdigest()
+
+
+class ExportCache:
+    """Content-addressed export cache with an LRU size cap. Plain attributes so it pickles to workers."""
+
+    def __init__(self, root=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.root = root or default_cache_dir()
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+    def key(self, source_path, settings, profile, max_size=None, stream=False, post_size=None):
+        """Cache key for exporting ``source_path`` with these settings, profile, decode size and post size."""
+        return export_key(source_path, settings, profile, max_size, stream, post_size)
+
+    def _entry_dir(self, key):
+        return os.path.join(self.root, key[:2], key)
+
+    def _read_entry(self, entry_dir):
+        try:
+            with open(os.path.join(entry_dir, ENTRY_FILE), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def restore(self, key, folder):
+        """Materialize a cached export into ``folder``. Returns the written paths, or None on a miss."""
+        entry_dir = self._entry_dir(key)
+        entry = self._read_entry(entry_dir)
+        if entry is None or not all(os.path.exists(os.path.join(entry_dir, name)) for name in entry["files"]):
+            self.misses += 1
+            return None
+
+        os.makedirs(folder, exist_ok=True)
+        paths = []
+        try:
+            for name in entry["files"]:
+                path = os.path.join(folder, name)
+                shutil.copy2(os.path.join(entry_dir, name), path)
+                paths.append(path)
+            # The entry file's mtime is the LRU clock
+            os.utime(os.path.join(entry_dir, ENTRY_FILE))
+        except OSError:
+            # Evicted by another worker meanwhile: render it instead
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return paths
+
+    def store(self, key, paths):
+        """Add freshly exported files under ``key``, then evict down to the size cap."""
+        entry_dir = self._entry_dir(key)
+        if os.path.exists(os.path.join(entry_dir, ENTRY_FILE)):
+            return
+
+        # Build the entry beside its final location and rename it in, so a
+        # concurrent reader never sees a half-written entry.
+        tmp_dir = f"{entry_dir}.tmp-{uuid.uuid4().hex[:8]}"
+        os.makedirs(tmp_dir)
+        try:
+            size = 0
+            for path in paths:
+                # Copy rather than link, both ways: outputs may be edited in place
+                shutil.copy2(path, os.path.join(tmp_dir, os.path.basename(path)))
+                size += os.path.getsize(path)
+            entry = {"files": [os.path.basename(p) for p in paths], "bytes": size, "created": time.time()}
+            with open(os.path.join(tmp_dir, ENTRY_FILE), "w", encoding="utf-8") as f:
+                json.dump(entry, f)
+            os.rename(tmp_dir, entry_dir)
+        except OSError:
+            # Another worker stored the same key first, or the disk is full: the export itself is fine
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            return
+
+        self.stores += 1
+        self.evict()
+
+    def entries(self):
+        """(last_used, bytes, entry_dir) for every complete entry."""
+        found = []
+        if not os.path.isdir(self.root):
+            return found
+        for shard in os.listdir(self.root):
+            shard_dir = os.path.join(self.root, shard)
+            if not os.path.isdir(shard_dir):
+                continue
+            for name in os.listdir(shard_dir):
+                entry_dir = os.path.join(shard_dir, name)
+                entry = self._read_entry(entry_dir)
+                if entry is None:
+                    continue
+                try:
+                    last_used = os.path.getmtime(os.path.join(entry_dir, ENTRY_FILE))
+                except OSError:
+                    continue
+                found.append((last_used, entry["bytes"], entry_dir))
+        return found
+
+    def evict(self, max_bytes=None):
+        """Remove least-recently-used entries until the cache fits. Returns the number removed."""
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, entry_dir in entries:
+            if total <= max_bytes:
+                break
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            total -= size
+            removed += 1
+        self.evictions += removed
+        return removed
+
+    def clear(self):
+        return self.evict(max_bytes=0)
+
+    def stats(self):
+        entries = self.entries()
+        return {
+            "root": self.root,
+            "entries": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "stores": self.stores,
+            "evictions": self.evictions,
+        }
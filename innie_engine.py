@@ -0,0 +1,1226 @@
+"""
+Innie tiling engine.
+
+Everything needed to split a source image into Instagram grid posts, with no
+Tk dependency so it can run headless (batch jobs, render boxes, scripts).
+"""
+import os
+import sys
+import math
+import time
+import threading
+import weakref
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from PIL import Image, ImageDraw
+
+from innie_timing import span, tracer
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+try:
+    import numpy as np
+except ImportError:  # optional: faster compose backend
+    np = None
+
+# Constants
+POST_W = 1080
+POST_H = 1350
+# Post sizes an export can target; "feed" (4:5) is the default everywhere
+POST_FORMATS = {
+    "feed": (POST_W, POST_H),
+    "square": (1080, 1080),
+    "story": (1080, 1920),
+}
+GRID_COLS = 3
+GRID_COUNTS = (3, 6, 9)  # presets; any multiple of GRID_COLS works
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".gif", ".webp")
+
+BACKENDS = ("pillow", "numpy")
+
+# Width of the preview_grid composite written by the tile-at-a-time exports
+PREVIEW_EXPORT_WIDTH = POST_W
+# Width of one live-preview cell in the desktop app
+PREVIEW_CELL_WIDTH = 140
+
+
+class TileSettings:
+    """Render settings for one grid. Plain attributes so it pickles cleanly."""
+
+    def __init__(self, grid_count=6, margin_tb=80, margin_side=80, frame_enabled=True,
+                 frame_thickness=4, frame_style="outer", mode="cover", edge_margin=0):
+        if grid_count < GRID_COLS or grid_count % GRID_COLS:
+            raise ValueError(f"Grid count must be a multiple of {GRID_COLS}")
+        if mode not in ("cover", "fit"):
+            raise ValueError(f"Unknown mode: {mode}")
+        if frame_style not in ("outer", "individual"):
+            raise ValueError(f"Unknown frame style: {frame_style}")
+        self.grid_count = grid_count
+        self.margin_tb = margin_tb
+        self.margin_side = margin_side
+        self.frame_enabled = frame_enabled
+        self.frame_thickness = frame_thickness if frame_enabled else 0
+        self.frame_style = frame_style
+        self.mode = mode
+        self.edge_margin = edge_margin
+
+    @property
+    def cols(self):
+        return GRID_COLS
+
+    @property
+    def rows(self):
+        return self.grid_count // GRID_COLS
+
+    def to_dict(self):
+        return {
+            "grid_count": self.grid_count,
+            "margin_tb": self.margin_tb,
+            "margin_side": self.margin_side,
+            "frame_enabled": self.frame_enabled,
+            "frame_thickness": self.frame_thickness,
+            "frame_style": self.frame_style,
+            "mode": self.mode,
+            "edge_margin": self.edge_margin,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+    def __repr__(self):
+        args = ", ".join(f"{k}={v!r}" for k, v in self.to_dict().items())
+        return f"TileSettings({args})"
+
+
+class OutputProfile:
+    """How tiles are encoded on export: PNG (compress level), JPEG (quality, subsampling) or WebP."""
+
+    FORMATS = {"png": ("PNG", ".png"), "jpeg": ("JPEG", ".jpg"), "webp": ("WEBP", ".webp")}
+
+    def __init__(self, format="png", compress_level=6, quality=95, subsampling="4:4:4", lossless=False):
+        if format not in self.FORMATS:
+            raise ValueError(f"Unknown output format: {format}")
+        if not 0 <= compress_level <= 9:
+            raise ValueError("PNG compress level must be 0-9")
+        if not 1 <= quality <= 100:
+            raise ValueError("Quality must be 1-100")
+        self.format = format
+        self.compress_level = compress_level
+        self.quality = quality
+        self.subsampling = subsampling
+        self.lossless = lossless
+
+    @property
+    def ext(self):
+        return self.FORMATS[self.format][1]
+
+    def save_kwargs(self):
+        kwargs = {"format": self.FORMATS[self.format][0]}
+        if self.format == "png":
+            kwargs["compress_level"] = self.compress_level
+        elif self.format == "jpeg":
+            kwargs.update(quality=self.quality, subsampling=self.subsampling, optimize=True)
+        else:
+            kwargs.update(quality=self.quality, lossless=self.lossless)
+        return kwargs
+
+    def to_dict(self):
+        return {
+            "format": self.format,
+            "compress_level": self.compress_level,
+            "quality": self.quality,
+            "subsampling": self.subsampling,
+            "lossless": self.lossless,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+    def __repr__(self):
+        args = ", ".join(f"{k}={v!r}" for k, v in self.to_dict().items())
+        return f"OutputProfile({args})"
+
+
+def resolve_post_size(post_size=None):
+    """(width, height) from a POST_FORMATS name, a (width, height) pair, or None for "feed"."""
+    if post_size is None:
+        return POST_W, POST_H
+    if isinstance(post_size, str):
+        if post_size not in POST_FORMATS:
+            raise ValueError(f"Unknown post format: {post_size}")
+        return POST_FORMATS[post_size]
+    w, h = post_size
+    if w <= 0 or h <= 0:
+        raise ValueError("Post size must be positive")
+    return int(w), int(h)
+
+
+def post_format_name(post_size=None):
+    """"feed", "square", ... for a named size, else "<w>x<h>"."""
+    size = resolve_post_size(post_size)
+    for name, named in POST_FORMATS.items():
+        if named == size:
+            return name
+    return f"{size[0]}x{size[1]}"
+
+
+def _scaled(value, scale):
+    return int(round(value * scale))
+
+
+def compute_layout(settings, scale=1.0, post_size=None):
+    """Pixel-independent geometry of the grid: content sizes, edge padding and offsets.
+
+    ``post_size`` is the full-size post (see ``resolve_post_size``, default
+    1080×1350). ``scale`` runs the same layout at a smaller post size (e.g.
+    the preview cell), with margins, edge padding and frame thickness scaled
+    to match.
+    """
+    cols, rows = settings.cols, settings.rows
+    full_w, full_h = resolve_post_size(post_size)
+
+    if settings.margin_side * 2 >= full_w:
+        raise ValueError("Side margins too large")
+    if rows == 1 and settings.margin_tb * 2 >= full_h:
+        raise ValueError("Top/bottom margins too large")
+
+    post_w, post_h = _scaled(full_w, scale), _scaled(full_h, scale)
+    Ms, Mt = _scaled(settings.margin_side, scale), _scaled(settings.margin_tb, scale)
+    edge_margin = _scaled(settings.edge_margin, scale)
+    frame_thickness = _scaled(settings.frame_thickness, scale)
+    # Keep thin frames and edge gaps visible when scaled down
+    if settings.edge_margin > 0:
+        edge_margin = max(1, edge_margin)
+    if settings.frame_thickness > 0:
+        frame_thickness = max(1, frame_thickness)
+
+    content_widths = [post_w - (Ms if c == 0 else 0) - (Ms if c == cols - 1 else 0) for c in range(cols)]
+    content_heights = []
+    for r in range(rows):
+        top_m = Mt if (rows == 1 or r == 0) else 0
+        bottom_m = Mt if (rows == 1 or r == rows - 1) else 0
+        content_heights.append(post_h - top_m - bottom_m)
+
+    # Edge tiles padding: col 0 gets RIGHT padding, col 2 gets LEFT padding
+    # Middle column (col 1, tiles 2,5,8) gets both left and right padding
+    edge_padding = []
+    for c in range(cols):
+        pad_left = edge_margin if c == cols - 1 else 0   # Col 2 (tiles 3,6,9): LEFT padding
+        pad_right = edge_margin if c == 0 else 0         # Col 0 (tiles 1,4,7): RIGHT padding
+
+        # Middle column gets both sides
+        if c == 1:
+            pad_left = edge_margin
+            pad_right = edge_margin
+        edge_padding.append({'pad_left': pad_left, 'pad_right': pad_right})
+
+    # Actual image content = content area minus edge padding
+    actual_content_widths = [content_widths[c] - edge_padding[c]['pad_left'] - edge_padding[c]['pad_right'] for c in range(cols)]
+    if min(actual_content_widths) <= 0:
+        raise ValueError("Edge margin too large")
+
+    return {
+        "cols": cols,
+        "rows": rows,
+        "post_w": post_w,
+        "post_h": post_h,
+        "margin_side": Ms,
+        "margin_tb": Mt,
+        "frame_thickness": frame_thickness,
+        "content_widths": content_widths,
+        "content_heights": content_heights,
+        "edge_padding": edge_padding,
+        "actual_content_widths": actual_content_widths,
+        "W_visible": sum(actual_content_widths),
+        "H_visible": sum(content_heights),
+        "cum_w": [sum(actual_content_widths[:i]) for i in range(cols)],
+        "cum_h": [sum(content_heights[:i]) for i in range(rows)],
+    }
+
+
+class Resample:
+    """How to downscale: a Pillow filter plus optional box pre-reduction.
+
+    With ``reducing_gap`` set, Pillow first shrinks by an integer factor with
+    ``Image.reduce`` (a cheap box filter) until the image is within
+    ``reducing_gap`` times the target, then runs ``filter`` for the rest.
+    Large ratios get much faster; the result is no longer bit-exact with a
+    single-step resize. See RESAMPLE_PRESETS for the ones the app uses.
+    """
+
+    FILTERS = {
+        "nearest": Image.NEAREST,
+        "box": Image.BOX,
+        "bilinear": Image.BILINEAR,
+        "hamming": Image.HAMMING,
+        "bicubic": Image.BICUBIC,
+        "lanczos": Image.LANCZOS,
+    }
+
+    def __init__(self, filter="lanczos", reducing_gap=None):
+        if filter not in self.FILTERS:
+            raise ValueError(f"Unknown resample filter: {filter}")
+        if reducing_gap is not None and reducing_gap < 1.0:
+            raise ValueError("reducing_gap must be at least 1.0")
+        self.filter = filter
+        self.reducing_gap = reducing_gap
+
+    def resize(self, img, size, box=None):
+        return img.resize(size, self.FILTERS[self.filter], box=box, reducing_gap=self.reducing_gap)
+
+    def contain(self, img, size):
+        """Downscale ``img`` to fit inside ``size``, keeping its aspect ratio. Never upscales, like ``thumbnail()``."""
+        scale = min(size[0] / img.size[0], size[1] / img.size[1])
+        if scale >= 1:
+            return img
+        return self.resize(img, (max(1, round(img.size[0] * scale)), max(1, round(img.size[1] * scale))))
+
+    def key(self):
+        return self.filter, self.reducing_gap
+
+    def to_dict(self):
+        return {"filter": self.filter, "reducing_gap": self.reducing_gap}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+    def __eq__(self, other):
+        return isinstance(other, Resample) and self.key() == other.key()
+
+    def __hash__(self):
+        return hash(self.key())
+
+    def __repr__(self):
+        return f"Resample({self.filter!r}, reducing_gap={self.reducing_gap})"
+
+
+# Per-purpose quality: exports are exact single-step LANCZOS, live previews
+# favour speed, thumbnails sit in between (Pillow's own thumbnail() default).
+RESAMPLE_PRESETS = {
+    "export": Resample("lanczos"),
+    "preview": Resample("bilinear", reducing_gap=2.0),
+    "thumbnail": Resample("bicubic", reducing_gap=2.0),
+}
+
+
+def resolve_resample(resample=None):
+    """A Resample from an instance, a preset name, or None for the export preset."""
+    if resample is None:
+        return RESAMPLE_PRESETS["export"]
+    if isinstance(resample, Resample):
+        return resample
+    if resample not in RESAMPLE_PRESETS:
+        raise ValueError(f"Unknown resample preset: {resample}")
+    return RESAMPLE_PRESETS[resample]
+
+
+def cover_size(src_size, target_w, target_h):
+    """Size ``resize_cover`` scales a ``src_size`` image to before cropping."""
+    scale = max(target_w / src_size[0], target_h / src_size[1])
+    return int(math.ceil(src_size[0] * scale)), int(math.ceil(src_size[1] * scale))
+
+
+def _crop_cover(img_resized, target_w, target_h):
+    new_w, new_h = img_resized.size
+    left, top = (new_w - target_w) // 2, (new_h - target_h) // 2
+    return img_resized.crop((left, top, left + target_w, top + target_h))
+
+
+def resize_cover(img, target_w, target_h, resample=None):
+    img_resized = resolve_resample(resample).resize(img, cover_size(img.size, target_w, target_h))
+    return _crop_cover(img_resized, target_w, target_h)
+
+
+def fit_placement(src_size, target_w, target_h):
+    """Where ``resize_fit`` puts the image inside the letterbox: (x, y, w, h)."""
+    scale = min(target_w / src_size[0], target_h / src_size[1])
+    new_w, new_h = int(round(src_size[0] * scale)), int(round(src_size[1] * scale))
+    return (target_w - new_w) // 2, (target_h - new_h) // 2, new_w, new_h
+
+
+def _letterbox(img_resized, target_w, target_h):
+    canvas = Image.new("RGB", (target_w, target_h), (0, 0, 0))
+    canvas.paste(img_resized, ((target_w - img_resized.size[0]) // 2, (target_h - img_resized.size[1]) // 2))
+    return canvas
+
+
+def resize_fit(img, target_w, target_h, resample=None):
+    _, _, new_w, new_h = fit_placement(img.size, target_w, target_h)
+    img_resized = resolve_resample(resample).resize(img, (new_w, new_h))
+    return _letterbox(img_resized, target_w, target_h)
+
+
+class ResizeCache:
+    """Bounded LRU of resized sources, evicted by decoded size in bytes.
+
+    Entries are keyed on source identity plus target geometry and mode, so
+    edits that keep ``W_visible``/``H_visible`` (frame thickness, frame style)
+    reuse the resize. Sources are held weakly; an entry only hits for the
+    exact image object it was computed from, and is dropped once that
+    object is garbage collected.
+    """
+
+    def __init__(self, max_bytes=256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Reentrant: a source can be collected, and its entries dropped, while the lock is held
+        self.lock = threading.RLock()
+
+    @staticmethod
+    def image_bytes(img):
+        if hasattr(img, "nbytes"):  # ndarray entries from the NumPy backend
+            return img.nbytes
+        # Pillow keeps every multi-band mode (RGB included) at 4 bytes per pixel
+        pixel_bytes = 4 if len(img.getbands()) > 1 or img.mode in ("I", "F") else 1
+        return img.size[0] * img.size[1] * pixel_bytes
+
+    def get(self, key, source):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0]() is not source:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, source, resized):
+        size = self.image_bytes(resized)
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.bytes -= self.image_bytes(old[1])
+            self.entries[key] = (weakref.ref(source, lambda ref: self._discard(key, ref)), resized)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, evicted) = self.entries.popitem(last=False)
+                self.bytes -= self.image_bytes(evicted)
+                self.evictions += 1
+
+    def _discard(self, key, ref):
+        with self.lock:
+            entry = self.entries.get(key)
+            # The key's id() may already belong to a newer source
+            if entry is not None and entry[0] is ref:
+                del self.entries[key]
+                self.bytes -= self.image_bytes(entry[1])
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        with self.lock:
+            return {
+                "entries": len(self.entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+def resize_source(img, target_w, target_h, mode, resample=None, cache=None, as_array=False):
+    """Cover- or fit-resize ``img`` to the visible grid area, through ``cache`` if given.
+
+    ``resample`` is a Resample or preset name (default: "export").
+    ``as_array`` returns (and caches) a read-only ndarray instead of an Image.
+    """
+    resample = resolve_resample(resample)
+    key = _resize_key(img, target_w, target_h, mode, resample, as_array)
+    if cache is not None:
+        resized = cache.get(key, img)
+        if resized is not None:
+            return resized
+
+    if as_array:
+        resized = np.asarray(resize_source(img, target_w, target_h, mode, resample))
+    elif mode == "cover":
+        resized = resize_cover(img, target_w, target_h, resample)
+    else:
+        resized = resize_fit(img, target_w, target_h, resample)
+
+    if cache is not None:
+        cache.put(key, img, resized)
+    return resized
+
+
+def _resize_key(img, target_w, target_h, mode, resample, as_array):
+    return id(img), target_w, target_h, mode, resample.key(), as_array
+
+
+def prime_resize_cache(img, targets, mode, cache, resample=None, as_array=False):
+    """Put ``resize_source`` results for every (target_w, target_h) in ``targets`` into ``cache``.
+
+    Targets that scale ``img`` to the same size (e.g. a portrait photo
+    covering both a 4:5 and a square grid, which differ only in the crop)
+    share one resample; the rest are left for ``resize_source`` to do on
+    demand. Results are identical to resizing each target on its own.
+    """
+    resample = resolve_resample(resample)
+    groups = {}
+    for target_w, target_h in targets:
+        if mode == "cover":
+            size = cover_size(img.size, target_w, target_h)
+        else:
+            size = fit_placement(img.size, target_w, target_h)[2:]
+        groups.setdefault(size, []).append((target_w, target_h))
+
+    for size, group in groups.items():
+        if len(group) < 2:
+            continue
+        with span("resize", size=size, mode=mode, shared=len(group)):
+            img_resized = resample.resize(img, size)
+        for target_w, target_h in group:
+            if mode == "cover":
+                resized = _crop_cover(img_resized, target_w, target_h)
+            else:
+                resized = _letterbox(img_resized, target_w, target_h)
+            if as_array:
+                resized = np.asarray(resized)
+            cache.put(_resize_key(img, target_w, target_h, mode, resample, as_array), img, resized)
+
+
+def resize_band(img, target_w, target_h, mode, y0, y1):
+    """Rows ``y0:y1`` of ``resize_source(img, target_w, target_h, mode)``, resampling only that band.
+
+    ``Image.resize(box=...)`` reads just the source rows the band's filter
+    support needs. Matches the full resize to within a couple of levels; the
+    per-band filter weights round slightly differently.
+    """
+    src_w, src_h = img.size
+    if mode == "cover":
+        scale = max(target_w / src_w, target_h / src_h)
+        new_w, new_h = int(math.ceil(src_w * scale)), int(math.ceil(src_h * scale))
+        left, top = (new_w - target_w) // 2, (new_h - target_h) // 2
+        sx, sy = src_w / new_w, src_h / new_h
+        box = (left * sx, (top + y0) * sy, (left + target_w) * sx, (top + y1) * sy)
+        return RESAMPLE_PRESETS["export"].resize(img, (target_w, y1 - y0), box=box)
+
+    x, y, new_w, new_h = fit_placement(img.size, target_w, target_h)
+    band = Image.new("RGB", (target_w, y1 - y0), (0, 0, 0))
+    iy0, iy1 = max(y0, y), min(y1, y + new_h)
+    if iy1 > iy0:
+        sy = src_h / new_h
+        box = (0, (iy0 - y) * sy, src_w, (iy1 - y) * sy)
+        part = RESAMPLE_PRESETS["export"].resize(img, (new_w, iy1 - iy0), box=box)
+        band.paste(part, (x, iy0 - y0))
+    return band
+
+
+def frame_rects(box, thickness, top, bottom, left, right):
+    """Frame sides as inclusive (x0, y0, x1, y1) rectangles ``thickness`` px into ``box``."""
+    fl, ft, fr, fb = box
+    rects = []
+    if top:
+        rects.append((fl, ft, fr, ft + thickness - 1))
+    if bottom:
+        rects.append((fl, fb - thickness + 1, fr, fb))
+    if left:
+        rects.append((fl, ft, fl + thickness - 1, fb))
+    if right:
+        rects.append((fr - thickness + 1, ft, fr, fb))
+    return tuple(rects)
+
+
+@lru_cache(maxsize=32)
+def frame_mask(post_size, rects):
+    """Frame overlay for one tile: (paste box, L mask cropped to that box), or None if empty.
+
+    Tiles with the same geometry share the mask, so a 9-grid needs at most
+    eight, and they survive across renders until the layout changes.
+    """
+    mask = Image.new("L", post_size, 0)
+    draw = ImageDraw.Draw(mask)
+    for rect in rects:
+        draw.rectangle(rect, fill=255)
+    bbox = mask.getbbox()
+    if not bbox:
+        return None
+    return bbox, mask.crop(bbox)
+
+
+def apply_frame(post, rects):
+    """Paint the frame onto ``post`` with a single masked paste."""
+    if not rects:
+        return
+    overlay = frame_mask(post.size, rects)
+    if overlay:
+        box, mask = overlay
+        post.paste((255, 255, 255), box, mask)
+
+
+def _place_pillow(content, post_size, offset):
+    post = Image.new("RGB", post_size, (0, 0, 0))
+    post.paste(content, offset)
+    return post
+
+
+def _place_numpy(content, post_size, offset):
+    # content is an ndarray view into the resized source
+    post_w, post_h = post_size
+    post = np.zeros((post_h, post_w, 3), dtype=np.uint8)
+    x, y = offset
+    post[y:y + content.shape[0], x:x + content.shape[1]] = content
+    return post
+
+
+def _frame_numpy(post, rects):
+    for x0, y0, x1, y1 in rects:
+        post[max(y0, 0):max(y1 + 1, 0), max(x0, 0):max(x1 + 1, 0)] = 255
+
+
+# backend -> (place content on a black post, draw frame rects, finish to an Image)
+_BACKEND_OPS = {
+    "pillow": (_place_pillow, apply_frame, lambda post: post),
+    "numpy": (_place_numpy, _frame_numpy, lambda post: Image.fromarray(post)),
+}
+
+
+def resolve_backend(backend=None):
+    """``None`` picks NumPy when installed; both backends produce identical bytes."""
+    if backend is None:
+        return "numpy" if np is not None else "pillow"
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend: {backend}")
+    if backend == "numpy" and np is None:
+        raise RuntimeError("NumPy backend requested but numpy is not installed (pip install numpy)")
+    return backend
+
+
+class TileCache:
+    """The last composed tile at each grid position, keyed on everything that determines its pixels.
+
+    A tile is reused (the same Image object is returned) when its slice of the
+    resized source, its placement on the post and its frame rects are all
+    unchanged; e.g. a frame edit only re-composes the tiles whose frame
+    edges moved. Holds the resized source the tiles were cut from, so its
+    ``id`` can't be recycled while the keys refer to it.
+    """
+
+    def __init__(self):
+        self.source = None
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, index, key):
+        entry = self.entries.get(index)
+        if entry is None or entry[0] != key:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry[1]
+
+    def put(self, index, key, tile):
+        self.entries[index] = (key, tile)
+
+    def clear(self):
+        self.source = None
+        self.entries.clear()
+
+    def stats(self):
+        return {"entries": len(self.entries), "hits": self.hits, "misses": self.misses}
+
+
+def tile_specs(layout, settings, fit_rect=None):
+    """Per-tile geometry in grid order: where each tile's content comes from and where it goes.
+
+    Each spec has the 1-based ``index``, ``row``/``col``, the source slice
+    (``x0``, ``y0``, ``src_w``, ``src_h``) in resized-source coordinates, the
+    paste offset on the post and the frame ``rects``. ``fit_rect`` is the
+    letterbox placement from ``fit_placement`` in fit mode.
+    """
+    cols, rows = layout["cols"], layout["rows"]
+    Ms, Mt = layout["margin_side"], layout["margin_tb"]
+    content_widths = layout["content_widths"]
+    content_heights = layout["content_heights"]
+    edge_padding = layout["edge_padding"]
+    actual_content_widths = layout["actual_content_widths"]
+    cum_w, cum_h = layout["cum_w"], layout["cum_h"]
+    thickness = layout["frame_thickness"]
+
+    specs = []
+    index = 1
+    for r in range(rows):
+        for c in range(cols):
+            x0, y0 = cum_w[c], cum_h[r]
+            src_w, src_h = actual_content_widths[c], content_heights[r]
+
+            top_m = Mt if (rows == 1 or r == 0) else 0
+            left_m = Ms if c == 0 else 0
+
+            # Edge padding for this column
+            e_pad_left = edge_padding[c]['pad_left']
+
+            # Draw image shifted by edge padding (leaves black margin on edge)
+            draw_x = left_m + e_pad_left
+
+            # Content area for frame (full content width including edge padding)
+            cw, ch = content_widths[c], content_heights[r]
+
+            # Skip frame on sides where edge margin is applied
+            skip_left = e_pad_left > 0
+            skip_right = edge_padding[c]['pad_right'] > 0
+
+            rects = ()
+            if settings.frame_enabled and thickness > 0:
+                if settings.frame_style == "individual" and settings.mode == "fit":
+                    # Fit mode: frame around actual image bounds, only on outer edges
+                    box = None
+                    if fit_rect is None:
+                        # Bounds depend on the source's aspect ratio: left for LayoutPlan.tiles_for
+                        rects = None
+                    else:
+                        fx, fy, fw, fh = fit_rect
+                        ix0, iy0 = max(fx, x0) - x0, max(fy, y0) - y0
+                        ix1, iy1 = min(fx + fw, x0 + src_w) - x0, min(fy + fh, y0 + src_h) - y0
+                        if ix1 > ix0 and iy1 > iy0:
+                            box = (draw_x + ix0, top_m + iy0, draw_x + ix1 - 1, top_m + iy1 - 1)
+                else:
+                    # Outer frame / individual cover: frame around content area, only on outer edges
+                    box = (left_m, top_m, left_m + cw - 1, top_m + ch - 1)
+
+                if box:
+                    rects = frame_rects(box, thickness, top=r == 0, bottom=r == rows - 1,
+                                        left=c == 0 and not skip_left, right=c == cols - 1 and not skip_right)
+
+            specs.append({
+                "index": index, "row": r, "col": c,
+                "x0": x0, "y0": y0, "src_w": src_w, "src_h": src_h,
+                "offset": (draw_x, top_m), "rects": rects,
+            })
+            index += 1
+    return specs
+
+
+class LayoutPlan:
+    """Compiled geometry for one TileSettings at one post size and scale, applied to any number of images.
+
+    Nothing in a plan depends on pixels: the layout from ``compute_layout``
+    plus every tile's source slice, paste offset and frame rects. The one
+    exception is the individual frame in fit mode, whose bounds follow the
+    source's aspect ratio; ``tiles_for`` fills those in per image.
+
+    ``compile`` is memoized, so batch jobs and repeated renders pay the
+    layout cost once. ``to_dict``/``from_dict`` round-trip through JSON, and
+    docs/layout.js builds the identical structure for the web app.
+    """
+
+    VERSION = 1
+
+    def __init__(self, settings, scale, layout, tiles):
+        self.settings = settings
+        self.scale = scale
+        self.layout = layout
+        self.tiles = tiles
+        self.per_image_frames = any(spec["rects"] is None for spec in tiles)
+
+    @classmethod
+    def compile(cls, settings, scale=1.0, post_size=None):
+        return _compile_plan(tuple(sorted(settings.to_dict().items())), scale, resolve_post_size(post_size))
+
+    @property
+    def post_size(self):
+        return self.layout["post_w"], self.layout["post_h"]
+
+    def fit_rect(self, src_size):
+        if self.settings.mode != "fit":
+            return None
+        return fit_placement(src_size, self.layout["W_visible"], self.layout["H_visible"])
+
+    def tiles_for(self, src_size):
+        """Tile specs for a source of ``src_size``: the compiled ones unless frames follow the image."""
+        if not self.per_image_frames:
+            return self.tiles
+        return tile_specs(self.layout, self.settings, self.fit_rect(src_size))
+
+    def to_dict(self):
+        return {
+            "version": self.VERSION,
+            "settings": self.settings.to_dict(),
+            "scale": self.scale,
+            "layout": self.layout,
+            "tiles": [dict(spec, offset=list(spec["offset"]),
+                           rects=None if spec["rects"] is None else [list(rect) for rect in spec["rects"]])
+                      for spec in self.tiles],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        if data.get("version") != cls.VERSION:
+            raise ValueError(f"Unsupported layout plan version: {data.get('version')}")
+        tiles = [dict(spec, offset=tuple(spec["offset"]),
+                      rects=None if spec["rects"] is None else tuple(tuple(rect) for rect in spec["rects"]))
+                 for spec in data["tiles"]]
+        return cls(TileSettings.from_dict(data["settings"]), data["scale"], data["layout"], tiles)
+
+
+@lru_cache(maxsize=64)
+def _compile_plan(settings_items, scale, post_size):
+    settings = TileSettings.from_dict(dict(settings_items))
+    layout = compute_layout(settings, scale, post_size)
+    return LayoutPlan(settings, scale, layout, tile_specs(layout, settings))
+
+
+def _compose_tile(source, spec, post_size, backend, y_shift=0):
+    """Cut one tile's content out of ``source`` and place and frame it on a post.
+
+    ``y_shift`` is the first source row held in ``source`` (for row bands).
+    """
+    place, draw_frame, finish = _BACKEND_OPS[backend]
+    x0, y0 = spec["x0"], spec["y0"] - y_shift
+    src_w, src_h = spec["src_w"], spec["src_h"]
+    t0 = time.perf_counter()
+    if backend == "numpy":
+        tile_content = source[y0:y0 + src_h, x0:x0 + src_w]
+    else:
+        tile_content = source.crop((x0, y0, x0 + src_w, y0 + src_h))
+    post = place(tile_content, post_size, spec["offset"])
+    t1 = time.perf_counter()
+    draw_frame(post, spec["rects"])
+    t2 = time.perf_counter()
+    tile = finish(post)
+    return tile, (t1 - t0) + (time.perf_counter() - t2), t2 - t1
+
+
+def iter_tiles(img, settings, scale=1.0, resample=None, cache=None, backend=None, tile_cache=None, post_size=None):
+    """Yield (index, Image) one tile at a time, in grid order.
+
+    The generator itself only keeps the resized source and the tile being
+    composed; how many tiles stay alive is up to the caller. Arguments are
+    as for ``generate_tiles``.
+    """
+    backend = resolve_backend(backend)
+    plan = LayoutPlan.compile(settings, scale, post_size)
+    post_size = plan.post_size
+    W_visible, H_visible = plan.layout["W_visible"], plan.layout["H_visible"]
+
+    with span("resize", size=(W_visible, H_visible), mode=settings.mode, scale=scale):
+        source = resize_source(img, W_visible, H_visible, settings.mode, resample, cache, backend == "numpy")
+    if tile_cache is not None and tile_cache.source is not source:
+        tile_cache.clear()
+        tile_cache.source = source
+
+    count = reused = 0
+    paste_seconds = frame_seconds = 0.0
+    for spec in plan.tiles_for(img.size):
+        index = spec["index"]
+        count += 1
+        # Everything this tile's pixels depend on; the source itself is pinned by tile_cache
+        key = (spec["x0"], spec["y0"], spec["src_w"], spec["src_h"], post_size, spec["offset"], spec["rects"], backend)
+        if tile_cache is not None:
+            tile = tile_cache.get(index, key)
+            if tile is not None:
+                reused += 1
+                yield index, tile
+                continue
+
+        tile, paste, frame = _compose_tile(source, spec, post_size, backend)
+        paste_seconds += paste
+        frame_seconds += frame
+        if tile_cache is not None:
+            tile_cache.put(index, key, tile)
+        yield index, tile
+
+    tracer.record("crop_paste", paste_seconds, tiles=count, reused=reused, backend=backend, scale=scale)
+    tracer.record("frame", frame_seconds, tiles=count, style=settings.frame_style, scale=scale)
+
+
+def generate_tiles(img, settings, scale=1.0, resample=None, cache=None, backend=None, tile_cache=None,
+                   post_size=None):
+    """Split ``img`` into posts. Returns {index: Image} with 1-based indices.
+
+    ``post_size`` is a POST_FORMATS name or (width, height); default 1080×1350.
+    With ``scale`` < 1 the posts come out at ``scale`` × that size; see
+    ``generate_preview_tiles``. ``resample`` picks the downscale quality
+    (a Resample or a RESAMPLE_PRESETS name, default "export"). Pass a ``ResizeCache`` to reuse the resized
+    source across renders of the same image, and a ``TileCache`` to reuse
+    the tiles a settings change doesn't affect. ``backend`` is "pillow",
+    "numpy" or None for the fastest available.
+    """
+    return dict(iter_tiles(img, settings, scale, resample, cache, backend, tile_cache, post_size))
+
+
+def iter_tile_rows(img, settings, backend=None, post_size=None):
+    """Yield (row, {index: Image}) one row of tiles at a time, for sources or grids too big for ``generate_tiles``.
+
+    Only the band of the resized source that a row needs is resampled, so
+    memory beyond the decoded source is one W_visible × post-height band
+    plus that row's tiles, whatever the row count.
+    """
+    backend = resolve_backend(backend)
+    plan = LayoutPlan.compile(settings, post_size=post_size)
+    layout = plan.layout
+    post_size = plan.post_size
+    W_visible, H_visible = layout["W_visible"], layout["H_visible"]
+    specs = plan.tiles_for(img.size)
+
+    for r in range(layout["rows"]):
+        y0 = layout["cum_h"][r]
+        y1 = y0 + layout["content_heights"][r]
+        with span("resize", size=(W_visible, y1 - y0), mode=settings.mode, row=r):
+            band = resize_band(img, W_visible, H_visible, settings.mode, y0, y1)
+            if backend == "numpy":
+                band = np.asarray(band)
+
+        tiles = {}
+        paste_seconds = frame_seconds = 0.0
+        for spec in specs[r * layout["cols"]:(r + 1) * layout["cols"]]:
+            tiles[spec["index"]], paste, frame = _compose_tile(band, spec, post_size, backend, y_shift=y0)
+            paste_seconds += paste
+            frame_seconds += frame
+        tracer.record("crop_paste", paste_seconds, tiles=len(tiles), backend=backend, row=r)
+        tracer.record("frame", frame_seconds, tiles=len(tiles), style=settings.frame_style, row=r)
+        yield r, tiles
+
+
+def generate_preview_tiles(img, settings, cell_w, cache=None, tile_cache=None, post_size=None):
+    """Tiles at display size: the full layout scaled so each post is ``cell_w`` wide.
+
+    Cheap enough to run on every edit; full-resolution tiles are only needed on save.
+    """
+    post_w, _ = resolve_post_size(post_size)
+    return generate_tiles(img, settings, scale=cell_w / post_w, resample="preview", cache=cache,
+                          tile_cache=tile_cache, post_size=post_size)
+
+
+def grid_folder(source_path, grid_count, out_dir=None, post_size=None):
+    """Output folder for a source: ``<name>_grid_<n>`` next to the source (or in ``out_dir``).
+
+    Post sizes other than feed get their own folder, e.g. ``<name>_grid_<n>_square``.
+    """
+    source_dir = out_dir or os.path.dirname(source_path)
+    source_name = os.path.splitext(os.path.basename(source_path))[0]
+    name = f"{source_name}_grid_{grid_count}"
+    if resolve_post_size(post_size) != POST_FORMATS["feed"]:
+        name += f"_{post_format_name(post_size)}"
+    return os.path.join(source_dir, name)
+
+
+def tile_filename(index, count, ext):
+    """``grid_01.png`` ...; zero-padded to the tile count so names always sort in grid order."""
+    return f"grid_{index:0{max(2, len(str(count)))}d}{ext}"
+
+
+class _PreviewComposite:
+    """``preview_grid`` built tile by tile at ``width`` px wide, instead of a full-resolution canvas."""
+
+    def __init__(self, cols, rows, width=PREVIEW_EXPORT_WIDTH, post_size=None):
+        post_w, post_h = resolve_post_size(post_size)
+        scale = width / (cols * post_w)
+        self.cols = cols
+        self.cell = round(post_w * scale), round(post_h * scale)
+        self.image = Image.new("RGB", (cols * self.cell[0], rows * self.cell[1]), (0, 0, 0))
+
+    def add(self, index, tile):
+        row, col = (index - 1) // self.cols, (index - 1) % self.cols
+        thumb = RESAMPLE_PRESETS["thumbnail"].resize(tile, self.cell)
+        self.image.paste(thumb, (col * self.cell[0], row * self.cell[1]))
+
+    def save(self, path, profile):
+        with span("encode", files=1, format=profile.format):
+            self.image.save(path, **profile.save_kwargs())
+
+
+def _save_timed(tile, path, kwargs):
+    start = time.perf_counter()
+    tile.save(path, **kwargs)
+    return time.perf_counter() - start
+
+
+def export_workers(grid_count):
+    """Encoder threads ``export_tiles`` uses by default: one per core, at most one per tile."""
+    return min(grid_count, os.cpu_count() or 1)
+
+
+def export_tiles(img, settings, folder, profile=None, backend=None, cache=None, preview_width=PREVIEW_EXPORT_WIDTH,
+                 post_size=None, workers=None):
+    """Compose tiles one at a time (see ``iter_tiles``) and encode them concurrently. Returns the written paths.
+
+    Each tile goes to an encoder thread as soon as it is composed; Pillow's
+    encoders release the GIL, so this scales with cores. At most ``workers``
+    tiles (default ``export_workers``) are encoding while the next is
+    composed, so memory stays bounded beside the resized source. The preview
+    is a ``preview_width`` composite built as the tiles pass through.
+    """
+    profile = profile or OutputProfile()
+    os.makedirs(folder, exist_ok=True)
+    kwargs = profile.save_kwargs()
+    preview = _PreviewComposite(settings.cols, settings.rows, preview_width, post_size)
+    workers = workers or export_workers(settings.grid_count)
+
+    paths = []
+    encode_seconds = 0.0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for index, tile in iter_tiles(img, settings, cache=cache, backend=backend, post_size=post_size):
+            path = os.path.join(folder, tile_filename(index, settings.grid_count, profile.ext))
+            preview.add(index, tile)
+            # Keep at most `workers` tiles in flight: wait for the oldest before queuing another
+            if len(pending) >= workers:
+                encode_seconds += pending.popleft().result()
+            pending.append(pool.submit(_save_timed, tile, path, kwargs))
+            paths.append(path)
+        encode_seconds += sum(future.result() for future in pending)
+    tracer.record("encode", encode_seconds, files=len(paths), format=profile.format)
+
+    preview_path = os.path.join(folder, f"preview_grid{profile.ext}")
+    preview.save(preview_path, profile)
+    return paths + [preview_path]
+
+
+def save_tiles_streaming(img, settings, folder, profile=None, backend=None, preview_width=PREVIEW_EXPORT_WIDTH,
+                         workers=None, post_size=None):
+    """Render and write tiles one row at a time (see ``iter_tile_rows``). Returns the written paths.
+
+    Each row is encoded on the thread pool while the next one is resampled.
+    The preview is built alongside at ``preview_width`` px wide rather than
+    full resolution, so it stays small for tall grids.
+    """
+    profile = profile or OutputProfile()
+    os.makedirs(folder, exist_ok=True)
+    kwargs = profile.save_kwargs()
+    preview = _PreviewComposite(settings.cols, settings.rows, preview_width, post_size)
+
+    paths = []
+    encode_seconds = 0.0
+    workers = workers or min(settings.cols + 1, os.cpu_count() or 1)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = []
+        for r, tiles in iter_tile_rows(img, settings, backend, post_size):
+            # Hold at most one row in the encoder: wait for the previous row before queuing this one
+            encode_seconds += sum(future.result() for future in pending)
+            pending = []
+            for index, tile in tiles.items():
+                path = os.path.join(folder, tile_filename(index, settings.grid_count, profile.ext))
+                pending.append(pool.submit(_save_timed, tile, path, kwargs))
+                paths.append(path)
+                preview.add(index, tile)
+        encode_seconds += sum(future.result() for future in pending)
+    tracer.record("encode", encode_seconds, files=len(paths), format=profile.format)
+
+    preview_path = os.path.join(folder, f"preview_grid{profile.ext}")
+    preview.save(preview_path, profile)
+    return paths + [preview_path]
+
+
+def grid_pixel_size(grid_count, post_size=None):
+    """Full output size of a grid: the most source resolution a render can use."""
+    post_w, post_h = resolve_post_size(post_size)
+    return GRID_COLS * post_w, (grid_count // GRID_COLS) * post_h
+
+
+def covering_grid_size(grid_count, post_sizes):
+    """Smallest size that covers ``grid_pixel_size`` for each of ``post_sizes``: one decode for all of them."""
+    sizes = [grid_pixel_size(grid_count, size) for size in post_sizes]
+    return max(w for w, _ in sizes), max(h for _, h in sizes)
+
+
+def peak_rss_bytes():
+    """Peak resident set size of this process so far, or None where unsupported."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def load_source(path, max_size=None):
+    """Open a source image as RGB, decoding no more than ``max_size`` needs.
+
+    JPEGs use draft mode so libjpeg decodes at 1/2, 1/4 or 1/8 scale directly;
+    other formats are box-reduced by an integer factor after decoding. Either
+    way the result stays at least ``max_size`` in both dimensions, so the
+    later LANCZOS resize is still a downscale.
+    """
+    with span("decode", path=os.path.basename(path)):
+        return reduce_source(_decode_draft(path, max_size), max_size)
+
+
+def _decode_draft(path, max_size=None):
+    # Decode as RGB, at the JPEG draft scale for max_size
+    img = Image.open(path)
+    if max_size:
+        img.draft("RGB", max_size)
+    if img.mode == "RGB":
+        # load() decodes in place and closes the file; convert() would hold a second full copy
+        img.load()
+    else:
+        with img:
+            img = img.convert("RGB")
+    return img
+
+
+def _draft_size(path, max_size=None):
+    # Size _decode_draft would return, from the header alone
+    with Image.open(path) as img:
+        if max_size:
+            img.draft("RGB", max_size)
+        return img.size
+
+
+def reduce_source(img, max_size=None):
+    """Box-reduce a decoded source by the largest integer factor that still covers ``max_size``."""
+    if max_size:
+        factor = min(img.size[0] // max_size[0], img.size[1] // max_size[1])
+        if factor >= 2:
+            img = img.reduce(factor)
+    return img
+
+
+def load_source_with_stats(path, max_size=None):
+    """``load_source`` plus load time, native/decoded size and peak RSS for reporting."""
+    start = time.perf_counter()
+    with Image.open(path) as probe:
+        native_size = probe.size
+    img = load_source(path, max_size)
+    return img, {
+        "seconds": time.perf_counter() - start,
+        "native_size": native_size,
+        "size": img.size,
+        "peak_rss": peak_rss_bytes(),
+    }
+
+
+def process_image(path, settings, out_dir=None, reduced_decode=True, profile=None, backend=None, cache=None,
+                  stream=False, post_size=None, cache_key=None):
+    """Load, split and save one source. Returns a small result dict for reporting.
+
+    With an ``ExportCache``, an unchanged source/settings/profile is served
+    from the cache without decoding or rendering. ``cache_key`` skips hashing
+    the source again when the caller already has its ``export_key``. Tiles are written as they
+    are composed (``export_tiles``); ``stream`` also resamples one row at a
+    time (``save_tiles_streaming``). ``post_size`` picks the post format.
+    """
+    start = time.perf_counter()
+    profile = profile or OutputProfile()
+    post_size = resolve_post_size(post_size)
+    max_size = grid_pixel_size(settings.grid_count, post_size) if reduced_decode else None
+    folder = grid_folder(path, settings.grid_count, out_dir, post_size)
+
+    key = cache_key
+    if cache is not None:
+        if key is None:
+            key = cache.key(path, settings, profile, max_size, stream, post_size)
+        paths = cache.restore(key, folder)
+        if paths is not None:
+            return {
+                "source": path,
+                "folder": folder,
+                "tiles": settings.grid_count,
+                "seconds": time.perf_counter() - start,
+                "cached": True,
+            }
+
+    img = load_source(path, max_size)
+    if stream:
+        paths = save_tiles_streaming(img, settings, folder, profile, backend, post_size=post_size)
+    else:
+        paths = export_tiles(img, settings, folder, profile, backend, post_size=post_size)
+    if cache is not None:
+        cache.store(key, paths)
+    return {
+        "source": path,
+        "folder": folder,
+        "tiles": settings.grid_count,
+        "seconds": time.perf_counter() - start,
+        "cached": False,
+    }
+
+
+def export_formats(img, settings, folders, profile=None, backend=None, cache=None, stream=False):
+    """Export ``img`` at several post sizes at once. Returns {post_size: paths}.
+
+    ``folders`` maps each post size, as ``resolve_post_size`` returns it, to
+    its output folder. Every format renders from the same ``img`` on its own
+    thread. Formats that scale the source to the same size share that
+    resample through ``cache`` (see ``prime_resize_cache``).
+    """
+    backend = resolve_backend(backend)
+    cache = cache if cache is not None else ResizeCache()
+    if not stream:
+        targets = []
+        for post_size in folders:
+            layout = LayoutPlan.compile(settings, post_size=post_size).layout
+            targets.append((layout["W_visible"], layout["H_visible"]))
+        prime_resize_cache(img, targets, settings.mode, cache, as_array=backend == "numpy")
+
+    with ThreadPoolExecutor(max_workers=len(folders)) as pool:
+        futures = {}
+        for post_size, folder in folders.items():
+            if stream:
+                futures[post_size] = pool.submit(save_tiles_streaming, img, settings, folder, profile, backend,
+                                                 post_size=post_size)
+            else:
+                futures[post_size] = pool.submit(export_tiles, img, settings, folder, profile, backend, cache,
+                                                 post_size=post_size)
+        return {post_size: future.result() for post_size, future in futures.items()}
+
+
+def process_image_formats(path, settings, post_sizes, out_dir=None, reduced_decode=True, profile=None, backend=None,
+                          cache=None, stream=False):
+    """``process_image`` for several post formats, one folder per format.
+
+    Every format gets exactly the source ``process_image`` would decode for
+    it, so tiles and cache entries match single-format runs. Formats whose
+    decodes would be identical share one, rendered in parallel with
+    ``export_formats``. Formats that only differ in the box reduction share
+    the JPEG draft decode; a different draft scale needs its own decode,
+    since DCT-domain scaling can't be reproduced from a larger one.
+    """
+    start = time.perf_counter()
+    profile = profile or OutputProfile()
+    post_sizes = list(dict.fromkeys(resolve_post_size(size) for size in post_sizes))
+    max_sizes = {size: grid_pixel_size(settings.grid_count, size) if reduced_decode else None for size in post_sizes}
+    folders = {size: grid_folder(path, settings.grid_count, out_dir, size) for size in post_sizes}
+
+    keys = {}
+    missing = {}
+    for size, folder in folders.items():
+        if cache is not None:
+            keys[size] = cache.key(path, settings, profile, max_sizes[size], stream, size)
+            if cache.restore(keys[size], folder) is not None:
+                continue
+        missing[size] = folder
+
+    by_draft = {}
+    for size in missing:
+        by_draft.setdefault(_draft_size(path, max_sizes[size]), []).append(size)
+    for sizes in by_draft.values():
+        with span("decode", path=os.path.basename(path)):
+            decoded = _decode_draft(path, max_sizes[sizes[0]])
+            by_source = {}
+            for size in sizes:
+                img = reduce_source(decoded, max_sizes[size])
+                by_source.setdefault(img.size, (img, {}))[1][size] = missing[size]
+        del decoded
+        for img, group in by_source.values():
+            written = export_formats(img, settings, group, profile, backend, stream=stream)
+            if cache is not None:
+                for size, paths in written.items():
+                    cache.store(keys[size], paths)
+        del by_source
+    return {
+        "source": path,
+        "folder": folders[post_sizes[0]],
+        "folders": list(folders.values()),
+        "tiles": settings.grid_count * len(folders),
+        "seconds": time.perf_counter() - start,
+        "cached": not missing,
+    }
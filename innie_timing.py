@@ -0,0 +1,113 @@
+"""
+Lightweight timing spans for the Innie pipeline.
+
+Stages (decode, resize, crop/paste, frame, thumbnail, encode) report to the
+module-level ``tracer``. With no sinks attached a span costs two
+``perf_counter`` calls, so instrumentation stays in place permanently.
+
+    from innie_timing import tracer, StatsSink, JsonLinesSink
+
+    stats = StatsSink()
+    tracer.add_sink(stats)                              # in-memory aggregates
+    tracer.add_sink(JsonLinesSink("trace.jsonl"))       # one JSON object per span
+    tracer.add_sink(lambda record: print(record))       # any callable works
+"""
+import cProfile
+import io
+import json
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+
+
+class Tracer:
+    """Fans finished spans out to sinks: callables taking a record dict."""
+
+    def __init__(self):
+        self.sinks = []
+
+    def add_sink(self, sink):
+        self.sinks.append(sink)
+        return sink
+
+    def remove_sink(self, sink):
+        if sink in self.sinks:
+            self.sinks.remove(sink)
+
+    def record(self, name, seconds, **fields):
+        """Report an already-measured duration (for time accumulated across a loop)."""
+        if not self.sinks:
+            return
+        record = {"span": name, "seconds": seconds, "ts": time.time(), "thread": threading.current_thread().name}
+        record.update(fields)
+        for sink in list(self.sinks):
+            sink(record)
+
+    @contextmanager
+    def span(self, name, **fields):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start, **fields)
+
+
+class StatsSink:
+    """In-memory aggregates per span name, plus the most recent duration of each."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.totals = {}
+        self.last = {}
+
+    def __call__(self, record):
+        name, seconds = record["span"], record["seconds"]
+        with self.lock:
+            stats = self.totals.setdefault(name, {"count": 0, "total": 0.0, "min": seconds, "max": seconds})
+            stats["count"] += 1
+            stats["total"] += seconds
+            stats["min"] = min(stats["min"], seconds)
+            stats["max"] = max(stats["max"], seconds)
+            self.last[name] = seconds
+
+    def summary(self):
+        with self.lock:
+            return {name: dict(stats, mean=stats["total"] / stats["count"]) for name, stats in self.totals.items()}
+
+    def reset(self):
+        with self.lock:
+            self.totals.clear()
+            self.last.clear()
+
+
+class JsonLinesSink:
+    """Append each span as one JSON line. Safe to share between threads."""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+
+    def __call__(self, record):
+        line = json.dumps(record) + "\n"
+        with self.lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+
+
+def profile_call(fn, *args, output=None, limit=25, **kwargs):
+    """Run ``fn`` under cProfile. Returns (result, top-``limit`` cumulative stats text).
+
+    ``output`` also dumps the raw profile for snakeviz / pstats.
+    """
+    profiler = cProfile.Profile()
+    result = profiler.runcall(fn, *args, **kwargs)
+    if output:
+        profiler.dump_stats(output)
+    text = io.StringIO()
+    pstats.Stats(profiler, stream=text).sort_stats("cumulative").print_stats(limit)
+    return result, text.getvalue()
+
+
+tracer = Tracer()
+span = tracer.span
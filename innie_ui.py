@@ -1,12 +1,17 @@
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
-from PIL import Image, ImageTk, ImageDraw
+from PIL import ImageTk
+from concurrent.futures import ThreadPoolExecutor
 import os
-import math
+import threading
+import time
 
-# Constants
-POST_W = 1080
-POST_H = 1350
+from innie_engine import (GRID_COUNTS, POST_FORMATS, PREVIEW_CELL_WIDTH, RESAMPLE_PRESETS, OutputProfile, ResizeCache,
+                          TileCache, TileSettings, covering_grid_size, export_formats, generate_preview_tiles,
+                          grid_folder, load_source_with_stats)
+from innie_timing import JsonLinesSink, profile_call, span, tracer
+
+PROFILE_PATH = "innie_render.prof"
 
 # Colors (Instagram-inspired)
 COLORS = {
@@ -47,17 +52,34 @@ class InnieUI:
         self.edge_tiles_enabled = False
         self.edge_margin = 0
         
-        # Generated tiles
+        # Generated tiles (display resolution; full-size tiles are built on save)
         self.tiles = {}
+        self.rendered_settings = None
         self.photo_images = {}
         self.labels = {}
         
         # Display sizes
-        self.cell_w = 140
+        self.cell_w = PREVIEW_CELL_WIDTH
         self.cell_h = 175
         
+        # Background rendering: one worker, newest request wins
+        self.render_pool = ThreadPoolExecutor(max_workers=1)
+        self.render_future = None
+        self.render_generation = 0
+        self.render_after_id = None
+        self.render_debounce_ms = 150
+        self.render_poll_ms = 16
+        self.render_started = 0.0
+        self.profile_next_render = False
+        self.resize_cache = ResizeCache()
+        self.tile_cache = TileCache()
+        
         self.setup_styles()
         self.setup_ui()
+        self.bind_live_preview()
+        
+        # Ctrl+Shift+P: run the next render under cProfile
+        self.root.bind("<Control-P>", self.toggle_profile)
     
     def setup_styles(self):
         style = ttk.Style()
@@ -93,6 +115,13 @@ class InnieUI:
         # Preview area
         self.create_preview_area()
     
+    def bind_live_preview(self):
+        # Any edit re-renders once the user pauses typing
+        for var in (self.grid_var, self.mode_var, self.margin_tb_var, self.margin_side_var,
+                    self.edge_tiles_var, self.edge_margin_var, self.frame_var,
+                    self.frame_style_var, self.frame_thick_var):
+            var.trace_add("write", self.schedule_render)
+    
     def create_header(self):
         header = tk.Frame(self.root, bg=COLORS["bg_card"], height=50)
         header.grid(row=0, column=0, columnspan=2, sticky="ew")
@@ -148,6 +177,10 @@ class InnieUI:
         self.create_section(content, "FRAME")
         self.create_frame_settings(content)
         
+        # Export Section
+        self.create_section(content, "EXPORT")
+        self.create_export_settings(content)
+        
         # Actions
         self.create_actions(content)
     
@@ -340,6 +373,54 @@ class InnieUI:
                               relief="flat", highlightthickness=1, highlightbackground=COLORS["border"])
         thick_entry.pack(fill=tk.X, pady=2, ipady=4)
     
+    def create_export_settings(self, parent):
+        container = tk.Frame(parent, bg=COLORS["bg_card"])
+        container.pack(fill=tk.X, padx=16, pady=4)
+        
+        row = tk.Frame(container, bg=COLORS["bg_card"])
+        row.pack(fill=tk.X, pady=4)
+        
+        # Format
+        format_frame = tk.Frame(row, bg=COLORS["bg_card"])
+        format_frame.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(0, 5))
+        
+        tk.Label(format_frame, text="Format", font=("Helvetica", 10),
+                bg=COLORS["bg_card"], fg=COLORS["text_secondary"]).pack(anchor="w")
+        
+        self.format_var = tk.StringVar(value="png")
+        format_combo = ttk.Combobox(format_frame, textvariable=self.format_var,
+                                    values=["png", "jpeg", "webp"], state="readonly", style="Dark.TCombobox")
+        format_combo.pack(fill=tk.X, pady=2)
+        
+        # Quality (JPEG/WebP)
+        quality_frame = tk.Frame(row, bg=COLORS["bg_card"])
+        quality_frame.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(5, 0))
+        
+        tk.Label(quality_frame, text="Quality", font=("Helvetica", 10),
+                bg=COLORS["bg_card"], fg=COLORS["text_secondary"]).pack(anchor="w")
+        
+        self.quality_var = tk.StringVar(value="95")
+        quality_entry = tk.Entry(quality_frame, textvariable=self.quality_var, font=("Helvetica", 11),
+                                bg=COLORS["bg_input"], fg=COLORS["text"], insertbackground=COLORS["text"],
+                                relief="flat", highlightthickness=1, highlightbackground=COLORS["border"])
+        quality_entry.pack(fill=tk.X, pady=2, ipady=4)
+        
+        # Post sizes: every checked one is exported to its own folder
+        tk.Label(container, text="Post Sizes", font=("Helvetica", 10),
+                bg=COLORS["bg_card"], fg=COLORS["text_secondary"]).pack(anchor="w", pady=(4, 0))
+        
+        posts_row = tk.Frame(container, bg=COLORS["bg_card"])
+        posts_row.pack(fill=tk.X, pady=2)
+        
+        self.post_format_vars = {}
+        for name, label in (("feed", "Feed 4:5"), ("square", "Square"), ("story", "Story")):
+            var = tk.BooleanVar(value=name == "feed")
+            tk.Checkbutton(posts_row, text=label, variable=var,
+                          font=("Helvetica", 10), bg=COLORS["bg_card"], fg=COLORS["text_secondary"],
+                          selectcolor=COLORS["bg_input"], activebackground=COLORS["bg_card"],
+                          activeforeground=COLORS["text"]).pack(side=tk.LEFT, padx=(0, 8))
+            self.post_format_vars[name] = var
+    
     def create_actions(self, parent):
         container = tk.Frame(parent, bg=COLORS["bg_card"])
         container.pack(fill=tk.X, padx=16, pady=20)
@@ -385,6 +466,7 @@ class InnieUI:
         
         self.labels = {}
         self.photo_images = {}
+        self.displayed_tiles = {}
         
         for row in range(self.rows):
             for col in range(self.cols):
@@ -408,13 +490,16 @@ class InnieUI:
         )
         if path:
             try:
-                self.source_image = Image.open(path).convert("RGB")
+                # Decode only what the largest grid can use, in any post size
+                self.source_image, stats = load_source_with_stats(
+                    path, covering_grid_size(max(GRID_COUNTS), POST_FORMATS.values()))
+                self.resize_cache.clear()
+                self.tile_cache.clear()
                 self.source_path = path
                 filename = os.path.basename(path)
                 
-                # Create thumbnail
-                thumb = self.source_image.copy()
-                thumb.thumbnail((248, 120), Image.LANCZOS)
+                # Create thumbnail (from the reduced image, no full-size copy)
+                thumb = RESAMPLE_PRESETS["thumbnail"].contain(self.source_image, (248, 120))
                 self.thumb_photo = ImageTk.PhotoImage(thumb)
                 self.thumb_label.config(image=self.thumb_photo)
                 
@@ -425,7 +510,15 @@ class InnieUI:
                 self.upload_zone.pack_forget()
                 self.thumb_frame.pack(fill=tk.X)
                 
-                self.badge.config(text=f"Loaded: {self.source_image.size[0]}×{self.source_image.size[1]}")
+                native_w, native_h = stats["native_size"]
+                info = f"Loaded: {native_w}×{native_h}"
+                if stats["size"] != stats["native_size"]:
+                    info += f" → {stats['size'][0]}×{stats['size'][1]}"
+                info += f" in {stats['seconds']:.2f}s"
+                if stats["peak_rss"]:
+                    info += f" · peak RSS {stats['peak_rss'] / (1024 * 1024):.0f} MB"
+                self.badge.config(text=info)
+                self.schedule_render()
             except Exception as e:
                 messagebox.showerror("Error", f"Failed to load image: {e}")
     
@@ -434,6 +527,9 @@ class InnieUI:
         self.source_path = None
         self.thumb_photo = None
         self.tiles = {}
+        self.cancel_render()
+        self.resize_cache.clear()
+        self.tile_cache.clear()
         
         # Hide thumbnail, show upload zone
         self.thumb_frame.pack_forget()
@@ -447,10 +543,28 @@ class InnieUI:
         self.rows = self.grid_count // 3
         self.create_grid_display()
         self.tiles = {}
+        self.cancel_render()
+    
+    def schedule_render(self, *args):
+        if self.render_after_id:
+            self.root.after_cancel(self.render_after_id)
+        self.render_after_id = self.root.after(self.render_debounce_ms, self.render_preview, True)
+    
+    def cancel_render(self):
+        # Bumping the generation makes any in-flight result stale
+        self.render_generation += 1
+        if self.render_future:
+            self.render_future.cancel()
+            self.render_future = None
     
-    def render_preview(self):
+    def render_preview(self, auto=False):
+        # A click on Render supersedes a debounced render that hasn't fired yet
+        if self.render_after_id:
+            self.root.after_cancel(self.render_after_id)
+            self.render_after_id = None
         if not self.source_image:
-            messagebox.showwarning("Warning", "Please select an image first")
+            if not auto:
+                messagebox.showwarning("Warning", "Please select an image first")
             return
         
         try:
@@ -463,166 +577,108 @@ class InnieUI:
             self.edge_tiles_enabled = self.edge_tiles_var.get()
             self.edge_margin = int(self.edge_margin_var.get()) if self.edge_tiles_enabled else 0
         except ValueError:
-            messagebox.showerror("Error", "Invalid margin or thickness values")
+            if auto:
+                self.badge.config(text="Invalid margin or thickness values")
+            else:
+                messagebox.showerror("Error", "Invalid margin or thickness values")
             return
         
-        try:
-            self.generate_tiles()
-            self.display_tiles()
-            self.badge.config(text="✓ Rendered successfully!")
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to render: {e}")
+        self.cancel_render()
+        generation = self.render_generation
+        settings = self.settings()
+        profile, self.profile_next_render = self.profile_next_render, False
+        self.render_started = time.perf_counter()
+        self.render_future = self.render_pool.submit(self.render_job, generation, self.source_image, settings, profile)
+        self.badge.config(text="Rendering...")
+        self.root.after(self.render_poll_ms, self.poll_render, self.render_future, generation, settings, auto)
     
-    def generate_tiles(self):
-        img = self.source_image
-        cols, rows = self.cols, self.rows
-        Ms, Mt = self.margin_side, self.margin_tb
-        edge_margin = self.edge_margin
-        
-        if Ms * 2 >= POST_W:
-            raise ValueError("Side margins too large")
-        if rows == 1 and Mt * 2 >= POST_H:
-            raise ValueError("Top/bottom margins too large")
-        
-        content_widths = [POST_W - (Ms if c == 0 else 0) - (Ms if c == cols - 1 else 0) for c in range(cols)]
-        content_heights = []
-        for r in range(rows):
-            top_m = Mt if (rows == 1 or r == 0) else 0
-            bottom_m = Mt if (rows == 1 or r == rows - 1) else 0
-            content_heights.append(POST_H - top_m - bottom_m)
-        
-        # Edge tiles padding: col 0 gets RIGHT padding, col 2 gets LEFT padding
-        # Middle column (col 1, tiles 2,5,8) gets both left and right padding
-        edge_padding = []
-        for c in range(cols):
-            pad_left = edge_margin if c == cols - 1 else 0   # Col 2 (tiles 3,6,9): LEFT padding
-            pad_right = edge_margin if c == 0 else 0         # Col 0 (tiles 1,4,7): RIGHT padding
-            
-            # Middle column gets both sides
-            if c == 1:
-                pad_left = edge_margin
-                pad_right = edge_margin
-            edge_padding.append({'pad_left': pad_left, 'pad_right': pad_right})
+    def render_job(self, generation, img, settings, profile=False):
+        # Runs on the worker thread; skip work that was superseded while queued
+        if generation != self.render_generation:
+            return None
         
-        # Actual image content = content area minus edge padding
-        actual_content_widths = [content_widths[c] - edge_padding[c]['pad_left'] - edge_padding[c]['pad_right'] for c in range(cols)]
+        # Collect this render's stage timings (only spans from this thread)
+        breakdown = {}
+        worker = threading.current_thread().name
         
-        W_visible, H_visible = sum(actual_content_widths), sum(content_heights)
+        def collect(record):
+            if record["thread"] == worker:
+                breakdown[record["span"]] = record["seconds"]
         
-        if self.mode == "cover":
-            img_resized = self.resize_cover(img, W_visible, H_visible)
-        else:
-            img_resized = self.resize_fit(img, W_visible, H_visible)
+        tracer.add_sink(collect)
+        try:
+            if profile:
+                tiles, report = profile_call(generate_preview_tiles, img, settings, self.cell_w,
+                                             self.resize_cache, self.tile_cache, output=PROFILE_PATH)
+                print(report)
+            else:
+                tiles = generate_preview_tiles(img, settings, self.cell_w, self.resize_cache, self.tile_cache)
+        finally:
+            tracer.remove_sink(collect)
+        return tiles, breakdown, profile
+    
+    def toggle_profile(self, event=None):
+        self.profile_next_render = True
+        self.badge.config(text="Profiling next render...")
+        self.schedule_render()
+    
+    def poll_render(self, future, generation, settings, auto):
+        if not future.done():
+            self.root.after(self.render_poll_ms, self.poll_render, future, generation, settings, auto)
+            return
+        if future.cancelled() or generation != self.render_generation:
+            return
         
-        cum_w = [sum(actual_content_widths[:i]) for i in range(cols)]
-        cum_h = [sum(content_heights[:i]) for i in range(rows)]
+        self.render_future = None
+        try:
+            tiles, breakdown, profiled = future.result()
+        except Exception as e:
+            if auto:
+                self.badge.config(text=f"✗ {e}")
+            else:
+                messagebox.showerror("Error", f"Failed to render: {e}")
+            return
         
-        self.tiles = {}
-        index = 1
-        for r in range(rows):
-            for c in range(cols):
-                x0, y0 = cum_w[c], cum_h[r]
-                src_w, src_h = actual_content_widths[c], content_heights[r]
-                tile_content = img_resized.crop((x0, y0, x0 + src_w, y0 + src_h))
-                
-                top_m = Mt if (rows == 1 or r == 0) else 0
-                left_m = Ms if c == 0 else 0
-                
-                # Edge padding for this column
-                e_pad_left = edge_padding[c]['pad_left']
-                
-                post = Image.new("RGB", (POST_W, POST_H), (0, 0, 0))
-                # Draw image shifted by edge padding (leaves black margin on edge)
-                draw_x = left_m + e_pad_left
-                post.paste(tile_content, (draw_x, top_m))
-                
-                # Content area for frame (full content width including edge padding)
-                cw, ch = content_widths[c], content_heights[r]
-                
-                # Skip frame on sides where edge margin is applied
-                skip_left = e_pad_left > 0
-                skip_right = edge_padding[c]['pad_right'] > 0
-                
-                if self.frame_enabled:
-                    draw = ImageDraw.Draw(post)
-                    fl, ft = left_m, top_m
-                    fr, fb = left_m + cw - 1, top_m + ch - 1
-                    
-                    if self.frame_style == "outer":
-                        # Outer frame: only on grid outer edges
-                        if r == 0:
-                            for t in range(self.frame_thickness):
-                                draw.line([(fl, ft + t), (fr, ft + t)], fill="white")
-                        if r == rows - 1:
-                            for t in range(self.frame_thickness):
-                                draw.line([(fl, fb - t), (fr, fb - t)], fill="white")
-                        if c == 0 and not skip_left:
-                            for t in range(self.frame_thickness):
-                                draw.line([(fl + t, ft), (fl + t, fb)], fill="white")
-                        if c == cols - 1 and not skip_right:
-                            for t in range(self.frame_thickness):
-                                draw.line([(fr - t, ft), (fr - t, fb)], fill="white")
-                    else:
-                        # Individual frame: on grid outer edges, using image content bounds for fit mode
-                        if self.mode == "fit":
-                            # Fit mode: frame around actual image bounds, only on outer edges
-                            bbox = tile_content.getbbox()
-                            if bbox:
-                                ix0 = draw_x + bbox[0]
-                                iy0 = top_m + bbox[1]
-                                ix1 = draw_x + bbox[2] - 1
-                                iy1 = top_m + bbox[3] - 1
-                                if r == 0:
-                                    for t in range(self.frame_thickness):
-                                        draw.line([(ix0, iy0 + t), (ix1, iy0 + t)], fill="white")  # top
-                                if r == rows - 1:
-                                    for t in range(self.frame_thickness):
-                                        draw.line([(ix0, iy1 - t), (ix1, iy1 - t)], fill="white")  # bottom
-                                if c == 0 and not skip_left:
-                                    for t in range(self.frame_thickness):
-                                        draw.line([(ix0 + t, iy0), (ix0 + t, iy1)], fill="white")  # left
-                                if c == cols - 1 and not skip_right:
-                                    for t in range(self.frame_thickness):
-                                        draw.line([(ix1 - t, iy0), (ix1 - t, iy1)], fill="white")  # right
-                        else:
-                            # Cover mode: frame around content area, only on outer edges
-                            if r == 0:
-                                for t in range(self.frame_thickness):
-                                    draw.line([(fl, ft + t), (fr, ft + t)], fill="white")  # top
-                            if r == rows - 1:
-                                for t in range(self.frame_thickness):
-                                    draw.line([(fl, fb - t), (fr, fb - t)], fill="white")  # bottom
-                            if c == 0 and not skip_left:
-                                for t in range(self.frame_thickness):
-                                    draw.line([(fl + t, ft), (fl + t, fb)], fill="white")  # left
-                            if c == cols - 1 and not skip_right:
-                                for t in range(self.frame_thickness):
-                                    draw.line([(fr - t, ft), (fr - t, fb)], fill="white")  # right
-                
-                self.tiles[index] = post
-                index += 1
+        self.tiles = tiles
+        self.rendered_settings = settings
+        start = time.perf_counter()
+        self.display_tiles()
+        breakdown["thumbnail"] = time.perf_counter() - start
+        
+        total_ms = (time.perf_counter() - self.render_started) * 1000
+        parts = " · ".join(f"{label} {breakdown[key] * 1000:.0f}" for key, label in (
+            ("resize", "resize"), ("crop_paste", "paste"), ("frame", "frame"), ("thumbnail", "thumbs"))
+            if key in breakdown)
+        text = f"✓ Rendered in {total_ms:.0f} ms — {parts} ms"
+        if profiled:
+            text += f" · profile → {PROFILE_PATH}"
+        self.badge.config(text=text)
     
-    def resize_cover(self, img, target_w, target_h):
-        scale = max(target_w / img.size[0], target_h / img.size[1])
-        new_w, new_h = int(math.ceil(img.size[0] * scale)), int(math.ceil(img.size[1] * scale))
-        img_resized = img.resize((new_w, new_h), Image.LANCZOS)
-        left, top = (new_w - target_w) // 2, (new_h - target_h) // 2
-        return img_resized.crop((left, top, left + target_w, top + target_h))
-    
-    def resize_fit(self, img, target_w, target_h):
-        scale = min(target_w / img.size[0], target_h / img.size[1])
-        new_w, new_h = int(round(img.size[0] * scale)), int(round(img.size[1] * scale))
-        img_resized = img.resize((new_w, new_h), Image.LANCZOS)
-        canvas = Image.new("RGB", (target_w, target_h), (0, 0, 0))
-        canvas.paste(img_resized, ((target_w - new_w) // 2, (target_h - new_h) // 2))
-        return canvas
+    def settings(self):
+        return TileSettings(
+            grid_count=self.grid_count,
+            margin_tb=self.margin_tb,
+            margin_side=self.margin_side,
+            frame_enabled=self.frame_enabled,
+            frame_thickness=self.frame_thickness,
+            frame_style=self.frame_style,
+            mode=self.mode,
+            edge_margin=self.edge_margin,
+        )
     
     def display_tiles(self):
-        for index, tile in self.tiles.items():
-            display_img = tile.resize((self.cell_w, self.cell_h), Image.LANCZOS)
-            photo = ImageTk.PhotoImage(display_img)
-            self.photo_images[index] = photo
-            self.labels[index].config(image=photo, text="")
+        with span("thumbnail", tiles=len(self.tiles)):
+            for index, tile in self.tiles.items():
+                # Tiles reused by the tile cache come back as the same object: keep their PhotoImage
+                if self.displayed_tiles.get(index) is tile:
+                    continue
+                self.displayed_tiles[index] = tile
+                display_img = tile
+                if tile.size != (self.cell_w, self.cell_h):
+                    display_img = RESAMPLE_PRESETS["thumbnail"].resize(tile, (self.cell_w, self.cell_h))
+                photo = ImageTk.PhotoImage(display_img)
+                self.photo_images[index] = photo
+                self.labels[index].config(image=photo, text="")
     
     def save_to_folder(self):
         if not self.tiles:
@@ -634,27 +690,35 @@ class InnieUI:
             return
         
         try:
-            source_dir = os.path.dirname(self.source_path)
-            source_name = os.path.splitext(os.path.basename(self.source_path))[0]
-            folder = os.path.join(source_dir, f"{source_name}_grid_{self.grid_count}")
-            os.makedirs(folder, exist_ok=True)
-            
-            for index, tile in self.tiles.items():
-                tile.save(os.path.join(folder, f"grid_{index:02d}.png"))
-            
-            preview = Image.new("RGB", (self.cols * POST_W, self.rows * POST_H), (0, 0, 0))
-            for index, tile in self.tiles.items():
-                row, col = (index - 1) // self.cols, (index - 1) % self.cols
-                preview.paste(tile, (col * POST_W, row * POST_H))
-            preview.save(os.path.join(folder, "preview_grid.png"))
+            profile = OutputProfile(format=self.format_var.get(), quality=int(self.quality_var.get()))
+        except ValueError as e:
+            messagebox.showerror("Error", f"Invalid export settings: {e}")
+            return
+        
+        post_sizes = [POST_FORMATS[name] for name, var in self.post_format_vars.items() if var.get()]
+        if not post_sizes:
+            messagebox.showwarning("Warning", "Select at least one post size")
+            return
+        
+        try:
+            folders = {size: grid_folder(self.source_path, self.grid_count, post_size=size) for size in post_sizes}
+            # All post sizes render in parallel from the decoded source; only tiles being encoded are kept in memory
+            written = export_formats(self.source_image, self.rendered_settings, folders, profile,
+                                     cache=self.resize_cache)
             
-            messagebox.showinfo("Success", f"Saved {len(self.tiles)} images + preview to:\n{folder}")
-            self.badge.config(text=f"✓ Saved to {os.path.basename(folder)}")
+            images = sum(len(paths) - 1 for paths in written.values())
+            previews = "preview" if len(folders) == 1 else f"{len(folders)} previews"
+            messagebox.showinfo("Success", f"Saved {images} images + {previews} to:\n" + "\n".join(folders.values()))
+            self.badge.config(text="✓ Saved to " + ", ".join(os.path.basename(f) for f in folders.values()))
         except Exception as e:
             messagebox.showerror("Error", f"Failed to save: {e}")
 
 
 def main():
+    # INNIE_TRACE=trace.jsonl logs every stage timing as JSON lines
+    if os.environ.get("INNIE_TRACE"):
+        tracer.add_sink(JsonLinesSink(os.environ["INNIE_TRACE"]))
+    
     root = tk.Tk()
     root.resizable(True, True)
     app = InnieUI(root)
@@ -0,0 +1,332 @@
+"""
+Watch an inbox folder and split every image that lands in it.
+
+    python innie.py watch inbox/ --out exports/
+
+Each source gets the same ``<name>_grid_<n>/`` folder the desktop app writes.
+A sidecar ``<name>.json`` next to a source overrides the render settings for
+that source, e.g. ``{"grid_count": 9, "mode": "fit", "output": {"format": "jpeg"}}``.
+
+Change detection uses inotify when ``inotify_simple`` is installed and polls
+the folder otherwise. A file is only queued once its size and mtime have been
+stable for the debounce window, so half-copied uploads are never rendered.
+Renders run on a bounded process pool, and a source is only re-rendered when
+its content hash or its settings changed; the last rendered key per source is
+kept in ``.innie_watch.json`` so restarts don't redo finished work.
+
+Queue depth, throughput and latency (detected → written) are logged per job
+and, with ``--status FILE``, kept up to date as JSON.
+"""
+import json
+import os
+import signal
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from innie_cache import export_key
+from innie_engine import (IMAGE_EXTENSIONS, OutputProfile, TileSettings, grid_folder, grid_pixel_size, process_image,
+                          resolve_post_size)
+
+try:
+    from inotify_simple import INotify, flags
+except ImportError:  # optional: falls back to polling
+    INotify = None
+
+STATE_NAME = ".innie_watch.json"
+SIDECAR_EXT = ".json"
+LATENCY_WINDOW = 200
+
+
+def _log(message):
+    print(f"[{datetime.now().strftime('%H:%M:%S')}] {message}", flush=True)
+
+
+def _signature(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+
+def load_sidecar(path, settings, profile):
+    """Settings and profile for ``path``, with its sidecar JSON (if any) applied on top."""
+    sidecar = os.path.splitext(path)[0] + SIDECAR_EXT
+    if not os.path.exists(sidecar):
+        return settings, profile
+    with open(sidecar, "r", encoding="utf-8") as f:
+        overrides = json.load(f)
+    output = overrides.pop("output", None)
+    settings = TileSettings.from_dict(dict(settings.to_dict(), **overrides))
+    if output:
+        profile = OutputProfile.from_dict(dict(profile.to_dict(), **output))
+    return settings, profile
+
+
+def _watch_job(path, settings, profile, out_dir, backend, cache, previous_key):
+    # Runs in a worker process. Hashing happens here too, so the watch loop never blocks on I/O.
+    try:
+        # The same key process_image would compute, so the source is only hashed once
+        key = export_key(path, settings, profile, grid_pixel_size(settings.grid_count), post_size=resolve_post_size())
+        folder = grid_folder(path, settings.grid_count, out_dir)
+        if key == previous_key and os.path.isdir(folder):
+            return {"source": path, "ok": True, "skipped": True, "key": key, "folder": folder, "tiles": 0}
+        result = process_image(path, settings, out_dir, True, profile, backend, cache, cache_key=key)
+        result.update(ok=True, skipped=False, key=key)
+        return result
+    except Exception as e:
+        return {"source": path, "ok": False, "error": f"{type(e).__name__}: {e}", "tiles": 0}
+
+
+class InboxWatcher:
+    """Debounced change detection + bounded render queue for one inbox folder."""
+
+    def __init__(self, inbox, settings, profile=None, out_dir=None, workers=None, backend=None, cache=None,
+                 debounce=2.0, interval=1.0, polling=False, status_path=None):
+        self.inbox = os.path.abspath(inbox)
+        self.settings = settings
+        self.profile = profile or OutputProfile()
+        self.out_dir = out_dir
+        self.workers = workers or os.cpu_count() or 1
+        self.backend = backend
+        self.cache = cache
+        self.debounce = debounce
+        self.interval = interval
+        self.status_path = status_path
+        self.state_path = os.path.join(out_dir or self.inbox, STATE_NAME)
+        self.state = self.load_state()
+
+        self.inotify = None
+        if INotify is not None and not polling:
+            self.inotify = INotify()
+            mask = flags.CLOSE_WRITE | flags.MOVED_TO | flags.MODIFY | flags.CREATE | flags.DELETE | flags.MOVED_FROM
+            self.inotify.add_watch(self.inbox, mask)
+
+        self.seen = {}        # path -> (size, mtime_ns) from the last scan
+        self.pending = {}     # path -> {"detected", "changed", "sig"} while debouncing
+        self.queue = deque()  # (path, detected) ready to render
+        self.running = {}     # future -> (path, detected)
+        self.pool = None
+        self.stopping = False
+        self.started = time.monotonic()
+        self.processed = 0
+        self.skipped = 0
+        self.failed = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+
+    # ---- state ----
+
+    def load_state(self):
+        if not os.path.exists(self.state_path):
+            return {}
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save_state(self):
+        tmp = self.state_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(tmp, self.state_path)
+
+    # ---- detection ----
+
+    def sources_for(self, path):
+        """The image(s) a changed path affects: itself, or every image sharing a sidecar's stem."""
+        if path.lower().endswith(IMAGE_EXTENSIONS):
+            return [path]
+        if path.endswith(SIDECAR_EXT):
+            stem = os.path.splitext(path)[0]
+            return [stem + ext for ext in IMAGE_EXTENSIONS if os.path.isfile(stem + ext)]
+        return []
+
+    def mark(self, path):
+        now = time.monotonic()
+        for source in self.sources_for(path):
+            entry = self.pending.get(source)
+            if entry is None:
+                self.pending[source] = {"detected": now, "changed": now, "sig": _signature(source)}
+            else:
+                entry["changed"] = now
+
+    def forget(self, path):
+        if path.endswith(SIDECAR_EXT):
+            # A removed sidecar puts its sources back on the default settings
+            self.seen.pop(path, None)
+            self.mark(path)
+            return
+        self.pending.pop(path, None)
+        self.seen.pop(path, None)
+        if self.state.pop(path, None) is not None:
+            self.save_state()
+
+    def scan(self):
+        """Polling detector: compare every file's size/mtime with the last scan."""
+        current = {}
+        for entry in os.scandir(self.inbox):
+            if entry.is_file() and entry.name.lower().endswith(IMAGE_EXTENSIONS + (SIDECAR_EXT,)):
+                current[entry.path] = _signature(entry.path)
+        for path, sig in current.items():
+            if self.seen.get(path) != sig:
+                self.mark(path)
+        for path in set(self.seen) - set(current):
+            self.forget(path)
+        self.seen = current
+
+    def read_events(self, timeout):
+        """inotify detector: block up to ``timeout`` seconds for events."""
+        for event in self.inotify.read(timeout=int(timeout * 1000)):
+            if not event.name:
+                continue
+            path = os.path.join(self.inbox, event.name)
+            if event.mask & (flags.DELETE | flags.MOVED_FROM):
+                self.forget(path)
+            else:
+                self.mark(path)
+
+    def promote(self):
+        """Move sources whose size/mtime held still for ``debounce`` seconds onto the queue."""
+        now = time.monotonic()
+        for path, entry in list(self.pending.items()):
+            sig = _signature(path)
+            if sig is None:
+                del self.pending[path]
+                continue
+            if sig != entry["sig"]:
+                entry["sig"], entry["changed"] = sig, now
+                continue
+            if now - entry["changed"] >= self.debounce:
+                del self.pending[path]
+                if all(queued != path for queued, _ in self.queue):
+                    self.queue.append((path, entry["detected"]))
+
+    # ---- rendering ----
+
+    def submit(self):
+        # At most one job per worker in flight; the rest wait in self.queue where they can still be coalesced
+        busy = {path for path, _ in self.running.values()}
+        for _ in range(len(self.queue)):
+            if len(self.running) >= self.workers:
+                break
+            path, detected = self.queue.popleft()
+            if path in busy:
+                self.queue.append((path, detected))
+                continue
+            try:
+                settings, profile = load_sidecar(path, self.settings, self.profile)
+            except (OSError, ValueError, TypeError) as e:
+                self.failed += 1
+                _log(f"✗ {os.path.basename(path)}: bad sidecar: {e}")
+                continue
+            future = self.pool.submit(_watch_job, path, settings, profile, self.out_dir, self.backend, self.cache,
+                                      self.state.get(path))
+            self.running[future] = (path, detected)
+            busy.add(path)
+
+    def collect(self):
+        for future in [f for f in self.running if f.done()]:
+            path, detected = self.running.pop(future)
+            try:
+                result = future.result()
+            except Exception as e:
+                # The worker process itself died (e.g. killed for memory).
+                result = {"source": path, "ok": False, "error": f"{type(e).__name__}: {e}"}
+            latency = time.monotonic() - detected
+            name = os.path.basename(path)
+
+            if not result["ok"]:
+                self.failed += 1
+                _log(f"✗ {name}: {result['error']}")
+                continue
+            if result["skipped"]:
+                self.skipped += 1
+                continue
+
+            self.processed += 1
+            self.latencies.append(latency)
+            self.state[path] = result["key"]
+            self.save_state()
+            cached = ", cached" if result.get("cached") else ""
+            _log(f"✓ {name} → {os.path.basename(result['folder'])} "
+                 f"(render {result['seconds']:.2f}s, latency {latency:.2f}s{cached}) · queue {self.queue_depth()}")
+
+    # ---- metrics ----
+
+    def queue_depth(self):
+        return len(self.pending) + len(self.queue) + len(self.running)
+
+    def status(self):
+        latencies = sorted(self.latencies)
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] if latencies else None
+        return {
+            "inbox": self.inbox,
+            "detector": "inotify" if self.inotify else "polling",
+            "uptime": round(time.monotonic() - self.started, 1),
+            "queue_depth": self.queue_depth(),
+            "debouncing": len(self.pending),
+            "queued": len(self.queue),
+            "running": len(self.running),
+            "processed": self.processed,
+            "skipped": self.skipped,
+            "failed": self.failed,
+            "latency_last": round(self.latencies[-1], 3) if latencies else None,
+            "latency_mean": round(sum(latencies) / len(latencies), 3) if latencies else None,
+            "latency_p95": round(p95, 3) if p95 is not None else None,
+        }
+
+    def write_status(self):
+        if not self.status_path:
+            return
+        tmp = self.status_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.status(), f, indent=2)
+        os.replace(tmp, self.status_path)
+
+    # ---- loop ----
+
+    def idle(self):
+        return not (self.pending or self.queue or self.running)
+
+    def stop(self, signum=None, frame=None):
+        self.stopping = True
+
+    def run(self, once=False):
+        """Watch until interrupted (Ctrl+C or SIGTERM). ``once`` processes what is in the inbox now and returns."""
+        detector = "inotify" if self.inotify else f"polling every {self.interval:g}s"
+        _log(f"Watching {self.inbox} ({detector}, {self.workers} workers, debounce {self.debounce:g}s)")
+        signal.signal(signal.SIGTERM, self.stop)
+
+        # Everything already in the inbox counts as new; unchanged sources are skipped by hash
+        self.scan()
+        self.pool = ProcessPoolExecutor(max_workers=self.workers)
+        try:
+            while not self.stopping:
+                if self.inotify is not None:
+                    self.read_events(self.interval if self.idle() else 0.05)
+                else:
+                    self.scan()
+                self.promote()
+                self.submit()
+                self.collect()
+                self.write_status()
+                if once and self.idle():
+                    break
+                if self.inotify is None:
+                    time.sleep(self.interval if self.idle() else 0.05)
+        except KeyboardInterrupt:
+            self.stopping = True
+        finally:
+            if self.stopping:
+                _log("Stopping, waiting for running jobs...")
+            self.pool.shutdown(wait=True)
+            self.collect()
+            self.write_status()
+            if self.inotify is not None:
+                self.inotify.close()
+
+        _log(f"✓ {self.processed} rendered, {self.skipped} unchanged, {self.failed} failed")
+        return 0 if not self.failed else 1
@@ -1,27 +1,53 @@
 import os
+import sys
+import json
 import time
+import random
+import asyncio
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 from pathlib import Path
+from types import SimpleNamespace
+
+from PIL import Image
 
 try:
     from instagrapi import Client
 except ImportError:
-    print("Error: instagrapi not installed.")
-    print("Install it with: pip install instagrapi")
-    exit(1)
+    Client = None  # --simulate still works without it
+
+
+GRID_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp")
+MANIFEST_NAME = "post_manifest.json"
+UPLOAD_DIR_NAME = ".upload"
+
+SIMULATED_SESSION_FILE = "session.simulated.json"
+
+# instagrapi exception names that mean "slow down" rather than "this failed"
+THROTTLE_ERRORS = ("PleaseWaitFewMinutes", "RateLimitError", "ClientThrottledError", "SimulatedThrottle")
 
 
 def get_grid_files(folder_path):
-    """Get all grid_XX.png files sorted in reverse order for Instagram posting."""
+    """Get all grid_XX files (png/jpg/webp) sorted in reverse order for Instagram posting."""
     folder = Path(folder_path)
     if not folder.exists():
         print(f"Error: Folder '{folder_path}' not found.")
         return []
     
     # Find all grid files
-    grid_files = sorted(folder.glob("grid_*.png"))
+    grid_files = sorted(f for f in folder.glob("grid_*") if f.suffix.lower() in GRID_EXTENSIONS)
     
     if not grid_files:
-        print(f"Error: No grid_*.png files found in '{folder_path}'")
+        print(f"Error: No grid_* image files found in '{folder_path}'")
+        return []
+    
+    # Exports in different formats to the same folder would post a tile twice
+    stems = [f.stem for f in grid_files]
+    duplicates = sorted({stem for stem in stems if stems.count(stem) > 1})
+    if duplicates:
+        print(f"Error: Multiple formats found for {', '.join(duplicates)} in '{folder_path}'")
         return []
     
     # Reverse order (Instagram shows last posted at top-left)
@@ -30,20 +56,133 @@ def get_grid_files(folder_path):
     return grid_files
 
 
-def login_instagram(username, password, session_file="session.json"):
-    """Login to Instagram and save/load session."""
-    cl = Client()
+class TokenBucket:
+    """
+    Token-bucket pacing: ``rate`` posts per second with bursts up to ``capacity``.
+    
+    ``reserve()`` takes a token and returns how long the caller must wait
+    before using it, so the same bucket works for blocking and asyncio callers.
+    """
+    
+    def __init__(self, rate, capacity=1, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.tokens = capacity
+        self.updated = clock()
+        self.lock = threading.Lock()
+    
+    def reserve(self):
+        with self.lock:
+            now = self.clock()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+    
+    def acquire(self):
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+def is_throttled(error):
+    """True for rate-limit style failures (429s and instagrapi's throttling errors)."""
+    if type(error).__name__ in THROTTLE_ERRORS:
+        return True
+    response = getattr(error, "response", None)
+    status = getattr(error, "status_code", None) or getattr(response, "status_code", None)
+    return status == 429
+
+
+def backoff_delay(attempt, base=2.0, cap=120.0):
+    """Exponential backoff with jitter: half fixed, half random, capped."""
+    delay = min(cap, base * 2 ** attempt)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def call_with_backoff(fn, retries=4, base=2.0, cap=120.0, sleep=time.sleep, log=print):
+    """Call ``fn``, retrying throttling errors with jittered exponential backoff."""
+    for attempt in range(retries + 1):
+        try:
+            return fn()
+        except Exception as e:
+            if not is_throttled(e) or attempt == retries:
+                raise
+            wait = backoff_delay(attempt, base, cap)
+            log(f"Throttled ({e}); retrying in {wait:.1f}s...")
+            sleep(wait)
+
+
+class SimulatedThrottle(Exception):
+    status_code = 429
+
+
+class SimulatedLoginRequired(Exception):
+    pass
+
+
+class SimulatedClient:
+    """
+    Offline stand-in for instagrapi.Client with the methods post.py uses.
+    
+    Uploads take ``latency`` seconds and fail with a 429 ``throttle_rate`` of
+    the time; nothing leaves the machine. Use it to rehearse a run (--simulate)
+    or to exercise resume, pacing and backoff without a network.
+    """
+    
+    def __init__(self, latency=0.5, throttle_rate=0.2, seed=None):
+        self.latency = latency
+        self.throttle_rate = throttle_rate
+        self.random = random.Random(seed)
+        self.settings = {}
+        self.logins = 0
+        self.uploads = 0
+    
+    def load_settings(self, path):
+        with open(path, "r", encoding="utf-8") as f:
+            self.settings = json.load(f)
+    
+    def dump_settings(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.settings, f)
     
-    # Try to load existing session
+    def login(self, username, password):
+        time.sleep(self.latency)
+        self.logins += 1
+        self.settings = {"simulated": True, "username": username, "sessionid": f"sim-{self.random.getrandbits(32)}"}
+        return True
+    
+    def get_timeline_feed(self):
+        time.sleep(self.latency / 5)
+        if not self.settings.get("sessionid"):
+            raise SimulatedLoginRequired("login_required")
+        return {"status": "ok"}
+    
+    def photo_upload(self, path, caption=""):
+        time.sleep(self.latency)
+        if self.random.random() < self.throttle_rate:
+            raise SimulatedThrottle("429 Too Many Requests (simulated)")
+        self.uploads += 1
+        return SimpleNamespace(pk=str(1000000 + self.uploads), path=path, caption=caption)
+
+
+def login_instagram(username, password, session_file="session.json", client_factory=None):
+    """Login to Instagram, reusing the saved session when it is still valid."""
+    cl = (client_factory or Client)()
+    
+    # Try to reuse the existing session without a fresh login round trip
     if os.path.exists(session_file):
         try:
             cl.load_settings(session_file)
-            cl.login(username, password)
-            print("Logged in using saved session.")
+            cl.get_timeline_feed()  # cheap authenticated call: fails if the session expired
+            print("Reusing saved session.")
             return cl
         except Exception as e:
-            print(f"Saved session failed: {e}")
+            print(f"Saved session invalid: {e}")
             print("Logging in fresh...")
+            cl = (client_factory or Client)()
     
     # Fresh login
     try:
@@ -56,25 +195,101 @@ def login_instagram(username, password, session_file="session.json"):
         return None
 
 
-def post_grid_images(folder_path, username, password, caption="", delay=5):
+class PostManifest:
+    """
+    Per-folder journal of what has been posted, so an interrupted run resumes
+    where it stopped instead of re-uploading.
+    
+    Each tile is "pending", "uploading", "posted" (with its media pk) or
+    "failed". The file is rewritten atomically after every state change.
+    """
+    
+    def __init__(self, folder_path):
+        self.path = Path(folder_path) / MANIFEST_NAME
+        self.data = {"version": 1, "tiles": {}}
+        if self.path.exists():
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.data = json.load(f)
+    
+    def tile(self, name):
+        return self.data["tiles"].get(name, {"state": "pending"})
+    
+    def state(self, name):
+        return self.tile(name)["state"]
+    
+    def mark(self, name, state, **fields):
+        entry = dict(self.tile(name), state=state, updated_at=datetime.now().isoformat(timespec="seconds"))
+        entry.update(fields)
+        self.data["tiles"][name] = entry
+        self.save()
+    
+    def save(self):
+        tmp = self.path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.data, f, indent=2)
+        os.replace(tmp, self.path)
+
+
+def prepare_upload(file_path, upload_dir):
+    """Return an upload-ready JPEG for a grid file, converting PNG/WebP tiles once."""
+    if file_path.suffix.lower() in (".jpg", ".jpeg"):
+        return file_path
+    
+    upload_dir.mkdir(exist_ok=True)
+    target = upload_dir / f"{file_path.stem}.jpg"
+    if not target.exists() or target.stat().st_mtime < file_path.stat().st_mtime:
+        with Image.open(file_path) as img:
+            img.convert("RGB").save(target, "JPEG", quality=95, subsampling=0)
+    return target
+
+
+def post_grid_images(folder_path, username, password, caption="", delay=5, simulate=False):
     """
     Post grid images to Instagram in reverse order.
     
+    Progress is journaled in the folder's post_manifest.json: rerunning on the
+    same folder skips tiles that are already posted. While waiting between
+    posts, the next tile's JPEG is prepared in the background. Posts are paced
+    by a token bucket (one per ``delay`` seconds) and throttling errors are
+    retried with jittered exponential backoff.
+    
     Args:
-        folder_path: Path to folder containing grid_XX.png files
+        folder_path: Path to folder containing grid_XX files
         username: Instagram username
         password: Instagram password
         caption: Caption for the posts (same for all)
-        delay: Seconds to wait between posts (default: 5)
+        delay: Minimum seconds between posts (default: 5)
+        simulate: Use the offline SimulatedClient instead of Instagram
     """
     grid_files = get_grid_files(folder_path)
     if not grid_files:
         return
     
+    manifest = PostManifest(folder_path)
+    
+    # A tile left "uploading" may or may not have gone up before the crash
+    for file_path in grid_files:
+        if manifest.state(file_path.name) == "uploading":
+            answer = input(f"{file_path.name} was uploading when the last run stopped. "
+                           f"Is it on the profile already? [y/n]: ").strip().lower()
+            if answer in ("y", "yes"):
+                manifest.mark(file_path.name, "posted", media_pk=None)
+            else:
+                manifest.mark(file_path.name, "pending")
+    
+    remaining = [f for f in grid_files if manifest.state(f.name) != "posted"]
+    
     print(f"\nFound {len(grid_files)} grid images to post.")
     print("Posting order (for correct grid alignment):")
     for i, file in enumerate(grid_files, 1):
-        print(f"  {i}. {file.name}")
+        status = "✓ posted" if file not in remaining else manifest.state(file.name)
+        print(f"  {i}. {file.name} [{status}]")
+    
+    if not remaining:
+        print("\n✓ All images already posted.")
+        return
+    if len(remaining) < len(grid_files):
+        print(f"\nResuming: {len(remaining)} left to post.")
     
     confirm = input("\nProceed with posting? [y/n]: ").strip().lower()
     if confirm not in ("y", "yes"):
@@ -82,40 +297,255 @@ def post_grid_images(folder_path, username, password, caption="", delay=5):
         return
     
     # Login
-    cl = login_instagram(username, password)
+    if simulate:
+        cl = login_instagram(username, password, SIMULATED_SESSION_FILE, SimulatedClient)
+    else:
+        cl = login_instagram(username, password)
     if not cl:
         return
+    limiter = TokenBucket(rate=1 / delay) if delay > 0 else None
     
-    # Post each image
+    # Post each image, preparing the next one while we wait
     print("\nStarting to post images...")
-    for i, file_path in enumerate(grid_files, 1):
-        try:
-            print(f"\nPosting {i}/{len(grid_files)}: {file_path.name}")
-            
-            # Upload photo
-            media = cl.photo_upload(
-                path=str(file_path),
-                caption=caption if i == 1 else ""  # Only caption on first post
-            )
-            
-            print(f"✓ Posted successfully (Media ID: {media.pk})")
-            
-            # Wait between posts (except after last one)
-            if i < len(grid_files):
-                print(f"Waiting {delay} seconds before next post...")
-                time.sleep(delay)
+    _, error = upload_grid(cl, folder_path, grid_files, manifest, caption, limiter)
+    if error:
+        print("Progress saved. Run again on the same folder to resume from this image.")
+        return
+    
+    print("\n✓ All done!")
+
+
+def upload_grid(cl, folder_path, grid_files, manifest, caption="", limiter=None, log=print):
+    """
+    Upload every not-yet-posted tile in grid order, journaling each in ``manifest``.
+    
+    Stops at the first failure, since posting later tiles out of order would
+    break the grid. Returns (number posted, error or None).
+    """
+    remaining = [f for f in grid_files if manifest.state(f.name) != "posted"]
+    if not remaining:
+        return 0, None
+    
+    upload_dir = Path(folder_path) / UPLOAD_DIR_NAME
+    posted = 0
+    with ThreadPoolExecutor(max_workers=1) as prep:
+        next_upload = prep.submit(prepare_upload, remaining[0], upload_dir)
+        for i, file_path in enumerate(remaining, 1):
+            try:
+                upload_path = next_upload.result()
+                if i < len(remaining):
+                    next_upload = prep.submit(prepare_upload, remaining[i], upload_dir)
+                
+                # Pace posts; the next JPEG keeps preparing while we wait
+                wait = limiter.acquire() if limiter else 0
+                if wait > 0:
+                    log(f"Waited {wait:.1f} seconds before next post.")
+                
+                log(f"Posting {i}/{len(remaining)}: {file_path.name}")
+                manifest.mark(file_path.name, "uploading")
                 
+                # Upload photo
+                media = call_with_backoff(lambda: cl.photo_upload(
+                    path=str(upload_path),
+                    caption=caption if file_path == grid_files[0] else ""  # Only caption on first post
+                ), log=log)
+                manifest.mark(file_path.name, "posted", media_pk=str(media.pk))
+                posted += 1
+                
+                log(f"✓ Posted successfully (Media ID: {media.pk})")
+                
+            except Exception as e:
+                manifest.mark(file_path.name, "failed", error=str(e))
+                log(f"✗ Failed to post {file_path.name}: {e}")
+                return posted, e
+    
+    return posted, None
+
+
+def load_jobs(job_file):
+    """
+    Read a queue file::
+    
+        {
+          "accounts": {"brand": {"username": "...", "password_env": "BRAND_PW"}},
+          "jobs": [{"folder": "launch_grid_9", "account": "brand",
+                    "caption": "...", "schedule": "2026-10-20T09:00", "delay": 30}]
+        }
+    
+    Passwords come from ``password_env`` (an environment variable) or ``password``.
+    Schedules with a UTC offset are converted to local time.
+    """
+    with open(job_file, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    
+    accounts = data.get("accounts", {})
+    jobs = []
+    for n, job in enumerate(data.get("jobs", []), 1):
+        if "folder" not in job or "account" not in job:
+            raise ValueError(f"Job {n}: 'folder' and 'account' are required")
+        if job["account"] not in accounts:
+            raise ValueError(f"Job {n}: unknown account '{job['account']}'")
+        schedule = job.get("schedule")
+        if schedule:
+            try:
+                schedule = datetime.fromisoformat(schedule)
+            except ValueError:
+                raise ValueError(f"Job {n}: invalid schedule '{schedule}'")
+            if schedule.tzinfo is not None:
+                # Compared against datetime.now(), which is naive local time
+                schedule = schedule.astimezone().replace(tzinfo=None)
+        jobs.append({
+            "name": job.get("name") or f"{job['account']}:{Path(job['folder']).name}",
+            "folder": job["folder"],
+            "account": job["account"],
+            "caption": job.get("caption", ""),
+            "delay": job.get("delay", 5),
+            "schedule": schedule or None,
+        })
+    return accounts, jobs
+
+
+def account_password(account):
+    if account.get("password_env"):
+        return os.environ.get(account["password_env"], "")
+    return account.get("password", "")
+
+
+async def run_account(name, account, jobs, simulate=False):
+    """Run one account's jobs in schedule order, sharing a login and one pacing bucket."""
+    loop = asyncio.get_running_loop()
+    results = []
+    
+    def log(msg):
+        print(f"[{name}] {msg}")
+    
+    if simulate:
+        # Never overwrite a real saved session with a simulated one
+        session_file = f"session.{name}.simulated.json"
+    else:
+        session_file = account.get("session_file") or f"session.{name}.json"
+    factory = SimulatedClient if simulate else None
+    try:
+        cl = await loop.run_in_executor(
+            None, login_instagram, account.get("username", name), account_password(account), session_file, factory)
+    except Exception as e:
+        log(f"✗ Login failed: {e}")
+        cl = None
+    
+    limiter = None
+    # Unscheduled jobs first, then by time
+    for job in sorted(jobs, key=lambda j: (j["schedule"] is not None, j["schedule"])):
+        result = {"job": job["name"], "account": name, "posted": 0, "status": "failed", "seconds": 0.0}
+        results.append(result)
+        
+        if job["schedule"]:
+            wait = (job["schedule"] - datetime.now()).total_seconds()
+            if wait > 0:
+                log(f"{job['name']} scheduled for {job['schedule']:%Y-%m-%d %H:%M}, waiting {wait:.0f}s")
+                await asyncio.sleep(wait)
+        
+        if not cl:
+            result["error"] = "login failed"
+            continue
+        
+        try:
+            limiter = await run_job(loop, cl, job, result, limiter, log)
         except Exception as e:
-            print(f"✗ Failed to post {file_path.name}: {e}")
-            retry = input("Continue with remaining posts? [y/n]: ").strip().lower()
-            if retry not in ("y", "yes"):
-                break
+            # A broken manifest or folder fails this job only
+            result["error"] = str(e)
+            log(f"✗ {job['name']}: {e}")
     
-    print("\n✓ All done!")
+    return results
+
+
+async def run_job(loop, cl, job, result, limiter, log):
+    """Post one queued grid, filling in ``result``. Returns the account's pacing bucket."""
+    grid_files = get_grid_files(job["folder"])
+    if not grid_files:
+        result["error"] = "no grid files"
+        return limiter
+    
+    manifest = PostManifest(job["folder"])
+    uncertain = [f.name for f in grid_files if manifest.state(f.name) == "uploading"]
+    if uncertain:
+        # Unattended: never risk a duplicate post, leave it for a human to check
+        result["error"] = f"{', '.join(uncertain)} left 'uploading' by an earlier run; check the profile"
+        log(f"✗ {job['name']}: {result['error']}")
+        return limiter
+    
+    # One bucket per account so pacing also holds between consecutive grids
+    delay = job["delay"]
+    if delay <= 0:
+        limiter = None
+    elif limiter is None or limiter.rate != 1 / delay:
+        limiter = TokenBucket(rate=1 / delay)
+    
+    log(f"Starting {job['name']} ({len(grid_files)} tiles)")
+    start = time.perf_counter()
+    posted, error = await loop.run_in_executor(
+        None, upload_grid, cl, job["folder"], grid_files, manifest, job["caption"], limiter, log)
+    result["seconds"] = time.perf_counter() - start
+    result["posted"] = posted
+    if error:
+        result["error"] = str(error)
+        # Later jobs for this account go on: each grid has its own manifest
+    else:
+        result["status"] = "done"
+        log(f"✓ {job['name']} done in {result['seconds']:.1f}s")
+    return limiter
+
+
+async def run_queue(job_file, simulate=False):
+    """Post every job in ``job_file``: accounts run concurrently, each account's jobs in order."""
+    accounts, jobs = load_jobs(job_file)
+    by_account = {}
+    for job in jobs:
+        by_account.setdefault(job["account"], []).append(job)
+    
+    start = time.perf_counter()
+    per_account = await asyncio.gather(*(
+        run_account(name, accounts[name], account_jobs, simulate)
+        for name, account_jobs in by_account.items()
+    ))
+    elapsed = time.perf_counter() - start
+    
+    results = [r for account_results in per_account for r in account_results]
+    print("\n=== Queue summary ===")
+    for r in results:
+        rate = r["posted"] / r["seconds"] * 60 if r["seconds"] else 0
+        line = f"{'✓' if r['status'] == 'done' else '✗'} {r['job']}: {r['posted']} posted in {r['seconds']:.1f}s ({rate:.1f} posts/min)"
+        if r.get("error"):
+            line += f" — {r['error']}"
+        print(line)
+    total = sum(r["posted"] for r in results)
+    print(f"\n{total} posts across {len(by_account)} accounts in {elapsed:.1f}s")
+    return results
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Post grid images to Instagram in the right order.")
+    parser.add_argument("--simulate", action="store_true",
+                        help="rehearse with an offline stand-in client (fake latency and 429s)")
+    parser.add_argument("--queue", metavar="JOBS_JSON",
+                        help="post every job in a queue file without prompts (see load_jobs)")
+    args = parser.parse_args()
+    
+    if Client is None and not args.simulate:
+        print("Error: instagrapi not installed.")
+        print("Install it with: pip install instagrapi")
+        sys.exit(1)
+    
+    if args.queue:
+        try:
+            results = asyncio.run(run_queue(args.queue, simulate=args.simulate))
+        except (OSError, ValueError) as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        sys.exit(0 if all(r["status"] == "done" for r in results) else 1)
+    
     print("=== Instagram Grid Poster ===\n")
+    if args.simulate:
+        print("(simulation: nothing will be posted)\n")
     
     folder_path = input("Enter folder path containing grid images: ").strip()
     username = input("Instagram username: ").strip()
@@ -127,7 +557,7 @@ def main():
     except ValueError:
         delay = 5
     
-    post_grid_images(folder_path, username, password, caption, delay)
+    post_grid_images(folder_path, username, password, caption, delay, simulate=args.simulate)
 
 
 if __name__ == "__main__":
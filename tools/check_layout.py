@@ -0,0 +1,110 @@
+"""
+Check that the Python engine and docs/layout.js compile identical layout plans.
+
+    python tools/check_layout.py            # needs node on PATH
+
+Every combination of grid count, margins, frame, mode, edge margin, scale
+and post size is compiled on both sides, along with the per-image tile specs for a few
+source aspect ratios (fit-mode individual frames depend on them). Invalid
+settings must fail on both sides. Exits non-zero on any difference.
+"""
+import itertools
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from innie_engine import POST_FORMATS, LayoutPlan, TileSettings
+
+LAYOUT_JS = os.path.join(ROOT, "docs", "layout.js")
+
+MATRIX = {
+    "grid_count": (3, 6, 9, 12),
+    "margin_tb": (0, 80, 700),
+    "margin_side": (0, 80, 333),
+    "frame": ((False, 4), (True, 1), (True, 4), (True, 40)),
+    "frame_style": ("outer", "individual"),
+    "mode": ("cover", "fit"),
+    "edge_margin": (0, 36, 500),
+    "scale": (1.0, 0.2, 150 / 1080),
+    "post_size": tuple(POST_FORMATS.values()),
+}
+SOURCE_SIZES = ((4000, 3000), (1200, 1800), (3000, 1000), (1081, 1349))
+
+NODE_SCRIPT = """
+const { compileLayoutPlan, planTilesFor } = require(process.argv[1]);
+let input = '';
+process.stdin.on('data', chunk => input += chunk);
+process.stdin.on('end', () => {
+    const results = JSON.parse(input).map(({ settings, scale, post_size, sizes }) => {
+        try {
+            const plan = compileLayoutPlan(settings, scale, post_size);
+            return { plan, per_image: sizes.map(([w, h]) => planTilesFor(plan, w, h)) };
+        } catch (e) {
+            return { error: e.message };
+        }
+    });
+    process.stdout.write(JSON.stringify(results));
+});
+"""
+
+
+def build_cases():
+    cases = []
+    for grid, tb, side, (frame_on, thickness), style, mode, edge, scale, post_size in itertools.product(
+            *MATRIX.values()):
+        settings = {"grid_count": grid, "margin_tb": tb, "margin_side": side, "frame_enabled": frame_on,
+                    "frame_thickness": thickness, "frame_style": style, "mode": mode, "edge_margin": edge}
+        cases.append({"settings": settings, "scale": scale, "post_size": post_size, "sizes": SOURCE_SIZES})
+    return cases
+
+
+def python_result(case):
+    try:
+        plan = LayoutPlan.compile(TileSettings.from_dict(case["settings"]), case["scale"], case["post_size"])
+    except ValueError as e:
+        return {"error": str(e)}
+    data = plan.to_dict()
+    # Per-image specs through the same JSON shape as to_dict()
+    per_image = [LayoutPlan(plan.settings, plan.scale, plan.layout, plan.tiles_for(size)).to_dict()["tiles"]
+                 for size in case["sizes"]]
+    return json.loads(json.dumps({"plan": data, "per_image": per_image}))
+
+
+def main():
+    node = shutil.which("node")
+    if not node:
+        print("✗ node not found on PATH")
+        return 1
+
+    cases = build_cases()
+    proc = subprocess.run([node, "-e", NODE_SCRIPT, LAYOUT_JS], input=json.dumps(cases),
+                          capture_output=True, text=True, check=True)
+    js_results = json.loads(proc.stdout)
+
+    failures = []
+    errors = 0
+    for case, js in zip(cases, js_results):
+        py = python_result(case)
+        if "error" in py or "error" in js:
+            errors += "error" in py
+            if py.get("error") != js.get("error"):
+                failures.append((case, py.get("error", "ok"), js.get("error", "ok")))
+        elif py != js:
+            failures.append((case, "plans differ", ""))
+
+    if failures:
+        print(f"✗ {len(failures)}/{len(cases)} cases differ:")
+        for case, py, js in failures[:10]:
+            print(f"  {case['settings']} scale={case['scale']:g} post={case['post_size']}: python={py} js={js}")
+        return 1
+    print(f"✓ {len(cases)} layout plans identical ({errors} invalid settings rejected by both)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())